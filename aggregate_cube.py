@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from data_cache import source_digest
+from streaming_cleaner import list_partition_files
+from time_periods import start_hour
+from transit_schema import read_typed_csv, table_to_frame
+
+DIMENSIONS = ['route_name', 'month', 'day_of_week', 'hour', 'day_type']
+STOP_COLS = ['early_stops', 'late_stops', 'on-time_stops']
+# additive measures per cell: row count plus sums; every mean in dataEDA.py is a ratio of two of these
+MEASURES = ['rows'] + STOP_COLS + ['on_time_pct']
+PCT_BINS = 20
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _prepare(df):
+    df = df.copy()
+    df['day'] = pd.to_datetime(df['day'])
+    # typed frames carry float32 counts; cube sums run over millions of rows, so accumulate in float64
+    df[STOP_COLS] = df[STOP_COLS].astype(np.float64)
+    total = df['early_stops'] + df['late_stops'] + df['on-time_stops']
+    df['on_time_pct'] = df['on-time_stops'] / total
+    # same filter as dataEDA.py: rows with no stops carry no punctuality information
+    df = df.loc[total > 0]
+    df['month'] = df['day'].dt.strftime('%Y-%m')
+    df['day_of_week'] = df['day'].dt.dayofweek
+    df['hour'] = start_hour(df['time_period'])
+    df['rows'] = 1
+    df['pct_bin'] = np.minimum((df['on_time_pct'] * PCT_BINS).astype(int), PCT_BINS - 1)
+    return df
+
+
+def _summarize(df):
+    df = _prepare(df)
+    cells = df.groupby(DIMENSIONS, dropna=False, as_index=False)[MEASURES].sum()
+    # on_time_pct histograms keep the distribution for the box plots; (route, day_type) is enough to
+    # answer both the weekday/weekend and the per-route views
+    pct_hist = df.groupby(['route_name', 'day_type', 'pct_bin'], dropna=False, as_index=False)['rows'].sum()
+    stop_hist = (
+        df[STOP_COLS].melt(var_name='stop_type', value_name='value')
+        .dropna()
+        .groupby(['stop_type', 'value'], as_index=False)
+        .size()
+        .rename(columns={'size': 'rows'})
+    )
+    return cells, pct_hist, stop_hist
+
+
+def _merge(current, update, keys, sign=1):
+    if sign != 1:
+        update = update.assign(**{c: update[c] * sign for c in update.columns if c not in keys})
+    if current is None or current.empty:
+        return update.reset_index(drop=True)
+    merged = pd.concat([current, update]).groupby(keys, dropna=False, as_index=False).sum()
+    # cells whose every row was retracted disappear instead of lingering as zeros
+    return merged.loc[merged['rows'] != 0].reset_index(drop=True)
+
+
+def _box_stats(hist, label):
+    counts = np.bincount(hist['pct_bin'].astype(int), weights=hist['rows'], minlength=PCT_BINS)
+    edges = np.linspace(0, 1, PCT_BINS + 1)
+    cdf = np.cumsum(counts) / counts.sum()
+    # quantiles interpolated inside a 1/PCT_BINS-wide bin
+    q1, med, q3 = np.interp([0.25, 0.5, 0.75], np.concatenate([[0], cdf]), edges)
+    nonempty = np.flatnonzero(counts)
+    iqr = q3 - q1
+    lo, hi = edges[nonempty[0]], edges[nonempty[-1] + 1]
+    return {'label': label, 'q1': float(q1), 'med': float(med), 'q3': float(q3),
+            'whislo': max(lo, q1 - 1.5 * iqr), 'whishi': min(hi, q3 + 1.5 * iqr), 'fliers': []}
+
+
+class AggregateCube:
+    def __init__(self):
+        self.cells = None
+        self.pct_hist = None
+        self.stop_hist = None
+        self.sources = []
+
+    def ingest(self, df, source=None, sign=1):
+        # sign=-1 subtracts rows counted earlier (a tombstone's superseded rows)
+        cells, pct_hist, stop_hist = _summarize(df)
+        self.cells = _merge(self.cells, cells, DIMENSIONS, sign)
+        self.pct_hist = _merge(self.pct_hist, pct_hist, ['route_name', 'day_type', 'pct_bin'], sign)
+        self.stop_hist = _merge(self.stop_hist, stop_hist, ['stop_type', 'value'], sign)
+        if source is not None:
+            self.sources.append(source)
+        return self
+
+    def update_from_partitions(self, partition_dir):
+        from record_index import read_tombstones
+
+        done = set(self.sources)
+        new = [f for f in list_partition_files(partition_dir) if os.path.relpath(f, partition_dir) not in done]
+        for path in new:
+            self.ingest(table_to_frame(ds.dataset(path, format='parquet').to_table()), os.path.relpath(path, partition_dir))
+        # rows an upsert or --dedup removed from a file the cube already counted are subtracted again
+        tombstones = [(t, source) for t, source in read_tombstones(partition_dir) if t not in done]
+        for t, source in tombstones:
+            if source in done:
+                self.ingest(table_to_frame(pq.read_table(os.path.join(partition_dir, t))), t, sign=-1)
+            else:
+                self.sources.append(t)
+        print(f"✅ Cube updated with {len(new)} new partition files and {len(tombstones)} tombstones "
+              f"({len(self.cells):,} cells)")
+        return len(new) + len(tombstones)
+
+    def save(self, cube_dir):
+        os.makedirs(cube_dir, exist_ok=True)
+        self.cells.to_parquet(os.path.join(cube_dir, 'cells.parquet'), index=False)
+        self.pct_hist.to_parquet(os.path.join(cube_dir, 'pct_hist.parquet'), index=False)
+        self.stop_hist.to_parquet(os.path.join(cube_dir, 'stop_hist.parquet'), index=False)
+        with open(os.path.join(cube_dir, 'sources.json'), 'w') as f:
+            json.dump(self.sources, f, indent=2)
+
+    @classmethod
+    def load(cls, cube_dir):
+        cube = cls()
+        cube.cells = pd.read_parquet(os.path.join(cube_dir, 'cells.parquet'))
+        cube.pct_hist = pd.read_parquet(os.path.join(cube_dir, 'pct_hist.parquet'))
+        cube.stop_hist = pd.read_parquet(os.path.join(cube_dir, 'stop_hist.parquet'))
+        with open(os.path.join(cube_dir, 'sources.json')) as f:
+            cube.sources = json.load(f)
+        return cube
+
+    # --- queries: everything below reads only the cube ---
+    def route_summary(self):
+        g = self.cells.groupby('route_name')[MEASURES].sum()
+        return pd.DataFrame({
+            'total_trips': g['rows'],
+            'avg_on_time_pct': g['on_time_pct'] / g['rows'],
+            'avg_late': g['late_stops'] / g['rows'],
+            'avg_early': g['early_stops'] / g['rows'],
+        }).sort_values('total_trips', ascending=False)
+
+    def monthly_on_time(self):
+        g = self.cells.groupby('month')[['on_time_pct', 'rows']].sum()
+        return (g['on_time_pct'] / g['rows']).rename('on_time_pct').reset_index()
+
+    def dow_hour_mean(self, measure='on-time_stops'):
+        g = self.cells.dropna(subset=['hour']).groupby(['day_of_week', 'hour'])[[measure, 'rows']].sum()
+        pivot = (g[measure] / g['rows']).unstack('hour')
+        pivot.index = [DAYS_ORDER[int(d)] for d in pivot.index]
+        return pivot.reindex(DAYS_ORDER)
+
+    def top_routes(self, n=10):
+        return self.cells.groupby('route_name')['rows'].sum().sort_values(ascending=False).head(n).index
+
+    def pct_box_stats(self, by, keys=None):
+        hist = self.pct_hist if keys is None else self.pct_hist[self.pct_hist[by].isin(keys)]
+        keys = sorted(hist[by].dropna().unique()) if keys is None else list(keys)
+        return [_box_stats(hist[hist[by] == k], k) for k in keys if (hist[by] == k).any()]
+
+    def stop_histogram(self, stop_type):
+        h = self.stop_hist[self.stop_hist['stop_type'] == stop_type]
+        return h['value'].to_numpy(), h['rows'].to_numpy()
+
+
+def load_or_build_cube(cube_dir, source):
+    # source is a month-partitioned store (updated incrementally) or a single cleaned CSV
+    cube = AggregateCube.load(cube_dir) if os.path.exists(os.path.join(cube_dir, 'sources.json')) else AggregateCube()
+    if os.path.isdir(source):
+        changed = cube.update_from_partitions(source)
+    else:
+        # a rewritten CSV is not an append, so a new digest means rebuilding from scratch
+        source_id = f"{os.path.abspath(source)}@{source_digest(source)}"
+        changed = int(source_id not in cube.sources)
+        if changed:
+            cube = AggregateCube().ingest(read_typed_csv(source), source_id)
+    if changed:
+        cube.save(cube_dir)
+    return cube
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally update the punctuality aggregate cube.")
+    parser.add_argument("source", help="cleaned CSV or month-partitioned Parquet directory")
+    parser.add_argument("--cube", default="punctuality_cube")
+    args = parser.parse_args()
+
+    cube = load_or_build_cube(args.cube, args.source)
+    print(cube.route_summary().head(10).round(2))
@@ -0,0 +1,174 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from instrumentation import PeakRSSSampler
+from preprocessing import CLASS_TARGET, build_feature_matrix, on_time_status
+from streaming_cleaner import list_partition_files
+from transit_schema import table_to_frame
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+STAGES = ['clean', 'merge', 'load', 'preprocess', 'train_xgb', 'train_linear', 'train_rf']
+DEFAULT_STAGES = ['clean', 'merge', 'load', 'preprocess', 'train_xgb', 'train_linear']
+REGRESSION_THRESHOLD = 0.10
+
+
+def _paths(work_dir, rows):
+    base = os.path.join(work_dir, f"rows_{rows}")
+    return {
+        'base': base,
+        'raw': os.path.join(base, 'raw.csv'),
+        'weather': os.path.join(base, 'weather.csv'),
+        'cleaned': os.path.join(base, 'cleaned'),
+        'merged': os.path.join(base, 'merged'),
+    }
+
+
+def _load_merged(paths):
+    df = table_to_frame(ds.dataset(list_partition_files(paths['merged']), format='parquet').to_table())
+    df[CLASS_TARGET] = on_time_status(df)
+    return df
+
+
+def _prepare(stage, paths):
+    # untimed input prep for a stage, returns a zero-arg callable that does the timed work
+    from synthetic_data import START_DATE
+
+    end_date = str((pd.Timestamp(START_DATE) + pd.Timedelta(days=400)).date())
+    if stage == 'clean':
+        from streaming_cleaner import clean_transit_csv
+        return lambda: clean_transit_csv(paths['raw'], paths['cleaned'], START_DATE, end_date)['rows_kept']
+    if stage == 'merge':
+        import shutil
+        from transit_weather_join import join_transit_weather
+        shutil.rmtree(paths['merged'], ignore_errors=True)
+        return lambda: join_transit_weather(paths['cleaned'], paths['weather'], paths['merged'])
+    if stage == 'load':
+        return lambda: len(_load_merged(paths))
+
+    df = _load_merged(paths)
+    if stage == 'preprocess':
+        # build_feature_matrix imports sklearn lazily; warm it here so the stage times the encoding, not the import
+        importlib.import_module('sklearn.model_selection')
+        return lambda: build_feature_matrix(df).values.shape[0]
+
+    features = build_feature_matrix(df)
+    del df
+    X_train, X_test, y_train, y_test = features.regression_split()
+    if stage == 'train_xgb':
+        from xgboost import XGBRegressor
+        return lambda: len(XGBRegressor(tree_method='hist', random_state=42).fit(X_train, y_train).predict(X_test))
+    if stage == 'train_linear':
+        from sklearn.linear_model import LinearRegression
+        return lambda: len(LinearRegression().fit(X_train, y_train).predict(X_test))
+    from sklearn.ensemble import RandomForestRegressor
+    return lambda: len(RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1)
+                       .fit(X_train, y_train).predict(X_test))
+
+
+def run_stage(stage, work_dir, rows):
+    import contextlib
+    import io
+
+    paths = _paths(work_dir, rows)
+    with contextlib.redirect_stdout(io.StringIO()):
+        work = _prepare(stage, paths)
+        with PeakRSSSampler() as mem:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            processed = work()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+    return {
+        'stage': stage, 'rows': rows, 'rows_processed': int(processed),
+        'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+        'rows_per_s': round(rows / wall, 1) if wall > 0 else None,
+        'peak_rss_mb': round(mem.peak / 2**20, 1),
+        'stage_rss_growth_mb': round((mem.peak - mem.baseline) / 2**20, 1),
+    }
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'timestamp': pd.Timestamp.now().isoformat(timespec='seconds')}
+
+
+def run_suite(scales, stages, work_dir, seed=42):
+    from synthetic_data import write_synthetic_dataset
+
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    for rows in scales:
+        paths = _paths(work_dir, rows)
+        os.makedirs(paths['base'], exist_ok=True)
+        if not os.path.exists(paths['raw']):
+            print(f"🧪 Generating {rows:,} synthetic rows")
+            write_synthetic_dataset(paths['raw'], paths['weather'], rows, seed=seed)
+        for stage in [s for s in STAGES if s in stages]:
+            # one fresh process per (stage, scale): clean RSS baseline, nothing cached between stages
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(run_stage, stage, work_dir, rows).result()
+            print(f"⏱️ {stage:<13} {rows:>12,} rows  {result['wall_s']:>9.3f}s  "
+                  f"{result['rows_per_s'] or 0:>14,.0f} rows/s  peak {result['peak_rss_mb']:>8.1f} MB")
+            results.append(result)
+    return {'meta': _metadata(), 'results': results}
+
+
+def compare(baseline_path, candidate_path, threshold=REGRESSION_THRESHOLD):
+    with open(baseline_path) as f:
+        base = pd.DataFrame(json.load(f)['results']).set_index(['stage', 'rows'])
+    with open(candidate_path) as f:
+        cand = pd.DataFrame(json.load(f)['results']).set_index(['stage', 'rows'])
+    joined = base[['wall_s', 'peak_rss_mb']].join(cand[['wall_s', 'peak_rss_mb']], lsuffix='_base', rsuffix='_new',
+                                                  how='inner')
+    joined['wall_ratio'] = joined['wall_s_new'] / joined['wall_s_base']
+    joined['mem_ratio'] = joined['peak_rss_mb_new'] / joined['peak_rss_mb_base']
+    joined['regression'] = (joined['wall_ratio'] > 1 + threshold) | (joined['mem_ratio'] > 1 + threshold)
+    return joined
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean -> merge -> preprocess -> train on synthetic data.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run")
+    run.add_argument("--scales", type=int, nargs="*", default=DEFAULT_SCALES)
+    run.add_argument("--stages", nargs="*", choices=STAGES, default=DEFAULT_STAGES)
+    run.add_argument("--work-dir", default="bench_data")
+    run.add_argument("--out", default="bench_results.json")
+    run.add_argument("--seed", type=int, default=42)
+
+    cmp_parser = sub.add_parser("compare")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("candidate")
+    cmp_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                            help="relative slowdown / memory growth that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_suite(args.scales, args.stages, args.work_dir, args.seed)
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to '{args.out}'")
+    else:
+        table = compare(args.baseline, args.candidate, args.threshold)
+        print(table.round(3).to_string())
+        flagged = table[table['regression']]
+        if len(flagged):
+            print(f"\n❌ {len(flagged)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
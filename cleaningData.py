@@ -1,5 +1,7 @@
 import pandas as pd
 
+from transit_schema import KEY_PARTS
+
 # ----------------------------
 # 1. Load the raw transit dataset
 # ----------------------------
@@ -38,6 +40,9 @@ print(df_filtered.isnull().sum())
 print("\nNumber of duplicate rows:")
 print(df_filtered.duplicated().sum())
 
+# Drop repeated observations of the same natural key (overlapping exports); the later row wins
+df_filtered = df_filtered.drop_duplicates(subset=KEY_PARTS, keep='last')
+
 # Drop rows with missing critical values
 df_filtered = df_filtered.dropna(subset=['day', 'route_number', 'route_destination'])
 
@@ -1,39 +1,17 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from aggregate_cube import load_or_build_cube
 
 # better styling
 sns.set(style="whitegrid")
 
-# load cleaned data
-df = pd.read_csv("cleaned_transit_data.csv")
-
-# ensure day is datetime
-df['day'] = pd.to_datetime(df['day'])
-
-# total stops = early + late + on-time
-df['total_stops'] = df['early_stops'] + df['late_stops'] + df['on-time_stops']
-
-# on-time percentage
-df['on_time_pct'] = df['on-time_stops'] / df['total_stops']
-
-# remove rows with no stops (0 total)
-df = df[df['total_stops'] > 0]
-
-# extract features
-df['month'] = df['day'].dt.to_period('M').astype(str)
-df['day_of_week'] = df['day'].dt.day_name()
-df['hour'] = df['time_period'].str.extract(r'(\d{1,2}):')[0].astype(float)
+# every summary below is answered from the pre-aggregated cube (route x month x day-of-week x hour x day_type
+# sums and counts); the cube only reads rows it has not seen before.
+# point the source at the month-partitioned store from streaming_cleaner.py to get incremental updates
+cube = load_or_build_cube("punctuality_cube", "cleaned_transit_data.csv")
 
 ### 1. Summary: Total trips and average punctuality per route
-route_summary = (
-    df.groupby('route_name')
-    .agg(total_trips=('total_stops', 'count'),
-         avg_on_time_pct=('on_time_pct', 'mean'),
-         avg_late=('late_stops', 'mean'),
-         avg_early=('early_stops', 'mean'))
-    .sort_values('total_trips', ascending=False)
-)
+route_summary = cube.route_summary()
 
 print("\n🔍 Top 10 Routes by Total Records:\n")
 print(route_summary.head(10).round(2))
@@ -69,14 +47,14 @@ plt.show()
 
 ### 5. Weekday vs Weekend On-Time %
 plt.figure(figsize=(7, 5))
-sns.boxplot(data=df, x='day_type', y='on_time_pct', palette='Set2')
+plt.gca().bxp(cube.pct_box_stats('day_type'), showfliers=False)
 plt.title("On-Time %: Weekday vs Weekend")
 plt.ylabel("On-Time Percentage")
 plt.tight_layout()
 plt.show()
 
 ### 6. Monthly Trend of On-Time %
-monthly_avg = df.groupby('month')['on_time_pct'].mean().reset_index()
+monthly_avg = cube.monthly_on_time()
 
 plt.figure(figsize=(10, 5))
 sns.lineplot(data=monthly_avg, x='month', y='on_time_pct', marker='o', color='blue')
@@ -89,9 +67,7 @@ plt.tight_layout()
 plt.show()
 
 ### 7. Heatmap: On-Time by Day of Week and Hour
-pivot = df.pivot_table(index='day_of_week', columns='hour', values='on-time_stops', aggfunc='mean')
-days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-pivot = pivot.reindex(days_order)
+pivot = cube.dow_hour_mean('on-time_stops')
 
 plt.figure(figsize=(12, 6))
 sns.heatmap(pivot, cmap="YlGnBu", linewidths=0.3)
@@ -103,17 +79,21 @@ plt.show()
 
 ### 8. Distribution of Stop Counts
 stop_cols = ['early_stops', 'late_stops', 'on-time_stops']
-df[stop_cols].hist(bins=30, figsize=(10, 5), color='skyblue')
+fig, axes = plt.subplots(2, 2, figsize=(10, 5))
+for ax, col in zip(axes.flat, stop_cols):
+    values, counts = cube.stop_histogram(col)
+    ax.hist(values, bins=30, weights=counts, color='skyblue')
+    ax.set_title(col)
+axes.flat[-1].set_visible(False)
 plt.suptitle("Distribution of Stop Types")
 plt.tight_layout()
 plt.show()
 
 ### 9. On-Time % for Most Frequent Routes (Top 10)
-top_routes = df['route_name'].value_counts().head(10).index
-df_top_routes = df[df['route_name'].isin(top_routes)]
+top_routes = cube.top_routes(10)
 
 plt.figure(figsize=(12, 6))
-sns.boxplot(x='route_name', y='on_time_pct', data=df_top_routes, palette='coolwarm')
+plt.gca().bxp(cube.pct_box_stats('route_name', top_routes), showfliers=False)
 plt.xticks(rotation=45)
 plt.title("On-Time % Distribution of Top 10 Frequent Routes")
 plt.ylabel("On-Time Percentage")
@@ -1,10 +1,11 @@
-import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from transit_schema import interval_start, read_typed_csv
+from weather_features import SNOW_BINS, SNOW_LEVELS, WINDGUST_BINS, WINDGUST_LEVELS, bin_levels
 
-# Load and clean data
-df = pd.read_csv('merged_transit_weather.csv')
-df['datetime'] = pd.to_datetime(df['datetime_x'], errors='coerce')
+# Load and clean data (categoricals / float32, redundant key and datetime columns dropped at read time)
+df = read_typed_csv('merged_transit_weather.csv')
+df['datetime'] = interval_start(df)
 df = df.dropna(subset=['late_stops', 'on-time_stops'])
 
 # Derived columns
@@ -12,18 +13,10 @@ df['total_stops'] = df['early_stops'] + df['late_stops'] + df['on-time_stops']
 df['on_time_pct'] = df['on-time_stops'] / df['total_stops']
 
 # Wind gust level classification (exclude 'Extreme' later)
-df['windgust_level'] = pd.cut(
-    df['windgust'],
-    bins=[-1, 20, 40, 60, 200],
-    labels=['Low', 'Medium', 'High', 'Extreme']
-)
+df['windgust_level'] = bin_levels(df['windgust'], WINDGUST_BINS, WINDGUST_LEVELS)
 
 # Snow level classification (will filter to only 'None' and 'Light')
-df['snow_level'] = pd.cut(
-    df['snow'],
-    bins=[-0.1, 0.1, 2, 100],
-    labels=['None', 'Snow', 'Heavy']
-)
+df['snow_level'] = bin_levels(df['snow'], SNOW_BINS, SNOW_LEVELS)
 
 # --- Summary Statistics ---
 print("Dataset Shape:", df.shape)
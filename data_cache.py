@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from instrumentation import trace_stage
+from transit_schema import read_typed_csv
+
+# bump whenever the way a CSV is turned into a cached frame changes
+SCHEMA_VERSION = 3
+CACHE_DIR = '.transit_cache'
+_DIGEST_INDEX = 'digests.json'
+
+
+def file_digest(path, block_size=8 * 1024 * 1024):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_digest_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, _DIGEST_INDEX)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_json_atomic(path, payload):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+def source_digest(path, cache_dir=CACHE_DIR):
+    # rehash only when size or mtime moved; a warm load then costs one stat() call
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    index = _read_digest_index(cache_dir)
+    entry = index.get(path)
+    if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+        return entry['digest']
+
+    digest = file_digest(path)
+    index[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'digest': digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_json_atomic(os.path.join(cache_dir, _DIGEST_INDEX), index)
+    return digest
+
+
+def cache_path_for(csv_path, digest, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{digest}-v{SCHEMA_VERSION}.feather")
+
+
+def _drop_stale(cache_dir, csv_path, keep):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        # {stem}-{digest}-v{N}.feather: match the stem exactly so 'merged' never sweeps 'merged-2024'
+        if name.endswith('.feather') and name.rsplit('-', 2)[0] == stem and path != keep:
+            os.remove(path)
+
+
+def read_cached_table(path, columns=None):
+    # uncompressed Arrow IPC + memory_map lets numeric columns come through without a copy
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+
+def load_frame(csv_path, cache_dir=CACHE_DIR, columns=None):
+    if cache_dir is None:
+        with trace_stage('load.csv_parse') as span:
+            df = read_typed_csv(csv_path, columns=columns)
+            span.set(df)
+        return df
+
+    with trace_stage('load.digest'):
+        digest = source_digest(csv_path, cache_dir)
+    path = cache_path_for(csv_path, digest, cache_dir)
+    if os.path.exists(path):
+        with trace_stage('load.cache_read') as span:
+            df = read_cached_table(path, columns).to_pandas(split_blocks=True)
+            span.set(df)
+        return df
+
+    with trace_stage('load.csv_parse') as span:
+        df = read_typed_csv(csv_path)
+        span.set(df)
+    with trace_stage('load.cache_write', df):
+        tmp = f"{path}.tmp"
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp, compression='uncompressed')
+        os.replace(tmp, path)
+    _drop_stale(cache_dir, csv_path, keep=path)
+    return df[columns] if columns is not None else df
@@ -1,45 +1,33 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
+from data_cache import CACHE_DIR, load_frame
+from instrumentation import traced
+from preprocessing import load_feature_matrix, on_time_status
 
 class TransitDataProcessor:
-    def __init__(self, csv_path):
+    def __init__(self, csv_path, cache_dir=CACHE_DIR):
         self.csv_path = csv_path
+        self.cache_dir = cache_dir
         self.df = None
+        self.features = None
         self.X_train = self.X_test = self.y_train = self.y_test = None
         self.X_train_reg = self.X_test_reg = self.y_train_reg = self.y_test_reg = None
 
+    @traced('processor.load_data', data=lambda self: self.df)
     def load_data(self):
-        self.df = pd.read_csv(self.csv_path)
+        self.df = load_frame(self.csv_path, self.cache_dir)
         print("✅ Data loaded successfully.")
 
+    @traced('processor.create_on_time_status', data=lambda self: self.df)
     def create_on_time_status(self):
-        self.df['on_time_status'] = self.df['on-time_stops'] > (
-            self.df['early_stops'] + self.df['late_stops']
-        )
-        self.df['on_time_status'] = self.df['on_time_status'].astype(int)
+        self.df['on_time_status'] = on_time_status(self.df)
         print("✅ 'on_time_status' column created.")
 
+    @traced('processor.preprocess_all', data=lambda self: self.features.values)
     def preprocess_all(self):
-        drop_cols = ['key', 'datetime_x', 'datetime_y', 'date', 'day', 'tempmax', 'tempmin', 'dew', 'windgust']
-        self.df.drop(columns=drop_cols, inplace=True, errors='ignore')
-
-        # Encode categorical columns
-        obj_cols = self.df.select_dtypes(include=['object']).columns
-        for col in obj_cols:
-            self.df[col] = LabelEncoder().fit_transform(self.df[col].astype(str))
-
-        self.df.fillna(0, inplace=True)
-
-        # Classification data
-        X = self.df.drop(columns=['on_time_status'])
-        y = self.df['on_time_status']
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        # Regression data
-        X_reg = self.df.drop(columns=['late_stops'])
-        y_reg = self.df['late_stops']
-        self.X_train_reg, self.X_test_reg, self.y_train_reg, self.y_test_reg = train_test_split(X_reg, y_reg, test_size=0.2, random_state=42)
+        # fitted encoders + the shared train-first matrix are cached per source file;
+        # both targets below are views into that one array
+        self.features = load_feature_matrix(self.csv_path, lambda: self.df, self.cache_dir)
+        self.X_train, self.X_test, self.y_train, self.y_test = self.features.classification_split()
+        self.X_train_reg, self.X_test_reg, self.y_train_reg, self.y_test_reg = self.features.regression_split()
 
     def get_train_test_data(self):
         return self.X_train, self.X_test, self.y_train, self.y_test
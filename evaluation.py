@@ -0,0 +1,17 @@
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score, mean_absolute_error, mean_squared_error, r2_score
+
+
+def classification_metrics(y_true, preds):
+    return {
+        'accuracy': accuracy_score(y_true, preds),
+        'f1': f1_score(y_true, preds, zero_division=0),
+    }
+
+
+def regression_metrics(y_true, preds):
+    return {
+        'mae': mean_absolute_error(y_true, preds),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, preds))),
+        'r2': r2_score(y_true, preds),
+    }
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from sparse_features import SparseFeatureEncoder
+
 # load the cleaned transit dataset and parse 'day' as datetime
 df = pd.read_csv("cleaned_transit_data.csv", parse_dates=['day'])
 
@@ -21,5 +23,11 @@ df_encoded['day_type'] = df_encoded['day_type'].map({'Weekday': 0, 'Weekend': 1}
 # extract day of week name from 'day' column
 df_encoded['day_of_week'] = df_encoded['day'].dt.day_name()
 
-# one-hot encode 'route_name' and 'day_of_week'; drop first to avoid multicollinearity
-df_encoded = pd.get_dummies(df_encoded, columns=['route_name', 'day_of_week'], drop_first=True)
+# one-hot encode 'route_name' and 'day_of_week'; drop first to avoid multicollinearity.
+# the result is a scipy CSR matrix next to the numeric columns, not a dense frame that widens with every route
+dense_cols = [c for c in df_encoded.select_dtypes('number').columns if c != 'high_punctuality']
+encoder = SparseFeatureEncoder(one_hot=['route_name', 'day_of_week'], crosses=[], dense=dense_cols,
+                               drop_first=True, scale_dense=False)
+X_encoded = encoder.fit_transform(df_encoded)
+y_encoded = df_encoded['high_punctuality'].to_numpy()
+feature_names = encoder.feature_names
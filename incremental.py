@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from evaluation import classification_metrics, regression_metrics
+from preprocessing import CLASS_TARGET, TransitPreprocessor, on_time_status
+from streaming_cleaner import list_partition_files
+from transit_schema import KEY_PARTS, table_to_frame
+
+# rows whose natural-key hash falls in this bucket are never trained on; both paths are scored on them
+HOLDOUT_MOD = 5
+ROUNDS_PER_UPDATE = 50
+XGB_PARAMS = {'tree_method': 'hist', 'seed': 42}
+
+
+def holdout_mask(df):
+    keys = [c for c in KEY_PARTS if c in df.columns]
+    return (pd.util.hash_pandas_object(df[keys], index=False).to_numpy() % HOLDOUT_MOD) == 0
+
+
+def read_partition_files(files):
+    df = table_to_frame(ds.dataset(files, format='parquet').to_table())
+    if CLASS_TARGET not in df.columns:
+        df[CLASS_TARGET] = on_time_status(df)
+    return df
+
+
+class LinearSufficientStats:
+    # X'X and X'y over everything seen so far; solving them gives the same OLS fit as a full refit
+    def __init__(self, n_features):
+        self.xtx = np.zeros((n_features + 1, n_features + 1))
+        self.xty = np.zeros(n_features + 1)
+        self.n = 0
+
+    def update(self, X, y, sign=1):
+        # sign=-1 takes rows back out, e.g. the old version of a corrected record
+        Xa = np.hstack([np.asarray(X, dtype=np.float64), np.ones((len(X), 1))])
+        self.xtx += sign * (Xa.T @ Xa)
+        self.xty += sign * (Xa.T @ np.asarray(y, dtype=np.float64))
+        self.n += sign * len(X)
+
+    def solve(self):
+        beta = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        return beta[:-1], beta[-1]
+
+    def predict(self, X):
+        coef, intercept = self.solve()
+        return np.asarray(X, dtype=np.float64) @ coef + intercept
+
+    def save(self, path):
+        np.savez(path, xtx=self.xtx, xty=self.xty, n=self.n)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        stats = cls(data['xtx'].shape[0] - 1)
+        stats.xtx, stats.xty, stats.n = data['xtx'], data['xty'], int(data['n'])
+        return stats
+
+
+def _targets(values):
+    # same column ranges as FeatureMatrix: regression drops late_stops, classification drops on_time_status
+    return (values[:, 1:], values[:, 0]), (values[:, :-1], values[:, -1])
+
+
+def _train_boosters(values, rounds, boosters=None, nthread=None):
+    import xgboost as xgb
+
+    (X_reg, y_reg), (X_cls, y_cls) = _targets(values)
+    params = dict(XGB_PARAMS, nthread=nthread or 0)
+    prev_reg, prev_cls = boosters or (None, None)
+    reg = xgb.train(dict(params, objective='reg:squarederror'), xgb.DMatrix(X_reg, y_reg),
+                    num_boost_round=rounds, xgb_model=prev_reg)
+    cls = xgb.train(dict(params, objective='binary:logistic'), xgb.DMatrix(X_cls, y_cls),
+                    num_boost_round=rounds, xgb_model=prev_cls)
+    return reg, cls
+
+
+def _score(values, reg, cls, linear):
+    import xgboost as xgb
+
+    (X_reg, y_reg), (X_cls, y_cls) = _targets(values)
+    return {
+        'xgb_regressor': regression_metrics(y_reg, reg.predict(xgb.DMatrix(X_reg))),
+        'xgb_classifier': classification_metrics(y_cls.astype(int), (cls.predict(xgb.DMatrix(X_cls)) > 0.5).astype(int)),
+        'linear_regressor': regression_metrics(y_reg, linear.predict(X_reg)),
+    }
+
+
+class IncrementalTrainer:
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.state = {'processed_files': [], 'rows_trained': 0, 'updates': []}
+        self.preprocessor = None
+        self.boosters = None
+        self.linear = None
+        if os.path.exists(self._path('state.json')):
+            self._load()
+
+    def _path(self, name):
+        return os.path.join(self.state_dir, name)
+
+    def _load(self):
+        import xgboost as xgb
+
+        with open(self._path('state.json')) as f:
+            self.state = json.load(f)
+        self.preprocessor = TransitPreprocessor.load(self._path('preprocessor.json'))
+        self.boosters = tuple(xgb.Booster(model_file=self._path(f"{name}.ubj")) for name in ('xgb_reg', 'xgb_cls'))
+        self.linear = LinearSufficientStats.load(self._path('linear_stats.npz'))
+
+    def _save(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.preprocessor.save(self._path('preprocessor.json'))
+        for name, booster in zip(('xgb_reg', 'xgb_cls'), self.boosters):
+            booster.save_model(self._path(f"{name}.ubj"))
+        self.linear.save(self._path('linear_stats.npz'))
+        tmp = self._path('state.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        # state.json is written last, so a crash mid-save just replays the same partitions
+        os.replace(tmp, self._path('state.json'))
+
+    def new_files(self, partition_dir):
+        done = set(self.state['processed_files'])
+        return [f for f in list_partition_files(partition_dir) if os.path.relpath(f, partition_dir) not in done]
+
+    def new_tombstones(self, partition_dir):
+        # rows an upsert or --dedup removed from part files; only files already trained on have anything to undo
+        from record_index import read_tombstones
+        seen = set(self.state.get('tombstones', []))
+        processed = set(self.state['processed_files'])
+        new = [(t, source) for t, source in read_tombstones(partition_dir) if t not in seen]
+        return [t for t, _ in new], [os.path.join(partition_dir, t) for t, source in new if source in processed]
+
+    def update(self, partition_dir, rounds=ROUNDS_PER_UPDATE, nthread=None):
+        files = self.new_files(partition_dir)
+        tombstones, retract = self.new_tombstones(partition_dir)
+        if not files and not tombstones:
+            print("✅ No new partitions since the last checkpoint.")
+            return None
+
+        started = time.perf_counter()
+        rows = retracted = 0
+        if files:
+            df = read_partition_files(files)
+            df = df.loc[~holdout_mask(df)]
+            if self.preprocessor is None:
+                self.preprocessor = TransitPreprocessor().fit(df)
+            else:
+                self.preprocessor.partial_fit(df)
+            # only the new rows are encoded; codes already handed out never change
+            values = self.preprocessor.transform(df)
+
+            self.boosters = _train_boosters(values, rounds, self.boosters, nthread)
+            if self.linear is None:
+                self.linear = LinearSufficientStats(values.shape[1] - 1)
+            (X_reg, y_reg), _ = _targets(values)
+            self.linear.update(X_reg, y_reg)
+            rows = len(df)
+        if retract:
+            # the linear statistics drop the superseded rows exactly; boosted trees cannot unlearn them, they are
+            # only corrected by the new rows boosted on above (a full retrain drops them for good)
+            old = read_partition_files(retract)
+            old = old.loc[~holdout_mask(old)]
+            (X_old, y_old), _ = _targets(self.preprocessor.transform(old))
+            self.linear.update(X_old, y_old, sign=-1)
+            retracted = len(old)
+
+        wall = time.perf_counter() - started
+        self.state['processed_files'] += [os.path.relpath(f, partition_dir) for f in files]
+        self.state['tombstones'] = self.state.get('tombstones', []) + tombstones
+        self.state['rows_trained'] += rows - retracted
+        self.state['updates'].append({'files': len(files), 'rows': rows, 'retracted': retracted,
+                                      'wall_s': round(wall, 3), 'total_rounds': self.boosters[0].num_boosted_rounds()})
+        self._save()
+        print(f"✅ Incremental update: {len(files)} new files, {rows:,} rows, {retracted:,} superseded rows "
+              f"taken back in {wall:.2f}s")
+        return {'rows': rows, 'retracted': retracted, 'wall_s': wall}
+
+    def compare_with_full_retrain(self, partition_dir, nthread=None):
+        if self.boosters is None:
+            raise RuntimeError("Run at least one incremental update before comparing.")
+        df = read_partition_files(list_partition_files(partition_dir))
+        held = holdout_mask(df)
+        train_df, holdout = df.loc[~held], df.loc[held]
+
+        started = time.perf_counter()
+        full_pre = TransitPreprocessor().fit(train_df)
+        full_values = full_pre.transform(train_df)
+        full_boosters = _train_boosters(full_values, self.boosters[0].num_boosted_rounds(), nthread=nthread)
+        full_linear = LinearSufficientStats(full_values.shape[1] - 1)
+        (X_reg, y_reg), _ = _targets(full_values)
+        full_linear.update(X_reg, y_reg)
+        full_wall = time.perf_counter() - started
+
+        last = self.state['updates'][-1]
+        report = {
+            'incremental': {'wall_s': last['wall_s'], 'rows_in_update': last['rows'],
+                            **_score(self.preprocessor.transform(holdout), *self.boosters, self.linear)},
+            'full_retrain': {'wall_s': round(full_wall, 3), 'rows_in_update': len(train_df),
+                             **_score(full_pre.transform(holdout), *full_boosters, full_linear)},
+        }
+        return report
+
+
+def print_report(report):
+    rows = []
+    for mode, result in report.items():
+        for model, metrics in result.items():
+            if isinstance(metrics, dict):
+                rows.append({'mode': mode, 'model': model, **metrics})
+    table = pd.DataFrame(rows).set_index(['model', 'mode']).sort_index()
+    print("\n📊 Incremental update vs full retrain (scored on the fixed holdout slice)")
+    print(table.round(4).to_string())
+    for mode, result in report.items():
+        print(f"⏱️ {mode}: {result['wall_s']:.2f}s over {result['rows_in_update']:,} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continue training from the last checkpoint using only new partitions.")
+    parser.add_argument("partition_dir", help="month-partitioned Parquet store (cleaned or merged)")
+    parser.add_argument("--state-dir", default="incremental_state")
+    parser.add_argument("--rounds", type=int, default=ROUNDS_PER_UPDATE, help="boosting rounds added per update")
+    parser.add_argument("--nthread", type=int, default=None)
+    parser.add_argument("--compare", action="store_true", help="also run a full retrain and compare")
+    args = parser.parse_args()
+
+    trainer = IncrementalTrainer(args.state_dir)
+    trainer.update(args.partition_dir, args.rounds, args.nthread)
+    if args.compare:
+        print_report(trainer.compare_with_full_retrain(args.partition_dir, args.nthread))
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from streaming_cleaner import (END_DATE, START_DATE, STOP_COLS, clean_chunk, month_partition_dir, months_between,
+                               standardize_column, write_month_partitions)
+
+PAGE_SIZE = 5_000
+CONCURRENCY = 8
+MAX_RETRIES = 5
+BACKOFF_S = 0.5
+TIMEOUT_S = 30
+STATE_FILE = '_ingest_state.json'
+# transient upstream failures worth retrying; any other HTTP error is a real problem with the request
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class FeedError(Exception):
+    pass
+
+
+def month_windows(start_date, end_date):
+    # one [start, end] window per calendar month, clipped to the requested range
+    windows = []
+    for month in months_between(start_date, end_date):
+        first = pd.Period(month, freq='M')
+        lo = max(first.start_time, pd.Timestamp(start_date))
+        hi = min(first.end_time.normalize(), pd.Timestamp(end_date))
+        windows.append((month, lo.strftime('%Y-%m-%d'), hi.strftime('%Y-%m-%d')))
+    return windows
+
+
+class Checkpoint:
+    # per feed and month: the [lo, hi] days asked for, the day ranges still to fetch, the cursor of the next page
+    # in the first of them, and pages written so far. Saved after every page, so a restarted run resumes at the
+    # first page that was not written yet.
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def get(self, feed, window, lo, hi):
+        state = self.state.setdefault(feed, {}).setdefault(window, {'cursor': None, 'pages': 0, 'rows': 0,
+                                                                    'done': False})
+        if 'lo' not in state:
+            state.update(lo=lo, hi=hi, pending=[] if state['done'] else [[lo, hi]])
+        # a wider date range than the month was fetched for reopens it, for the uncovered days only
+        day = pd.Timedelta(days=1)
+        if lo < state['lo']:
+            state['pending'].append([lo, (pd.Timestamp(state['lo']) - day).strftime('%Y-%m-%d')])
+            state['lo'] = lo
+        if hi > state['hi']:
+            state['pending'].append([(pd.Timestamp(state['hi']) + day).strftime('%Y-%m-%d'), hi])
+            state['hi'] = hi
+        state['done'] = not state['pending']
+        return state
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def _get_json(url, timeout=TIMEOUT_S):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class FeedClient:
+    # bounded concurrency: however many windows are in flight, at most `concurrency` requests are open.
+    # urllib runs in worker threads (asyncio.to_thread), so no extra HTTP dependency is needed.
+    def __init__(self, concurrency=CONCURRENCY, max_retries=MAX_RETRIES, backoff_s=BACKOFF_S, timeout=TIMEOUT_S):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.timeout = timeout
+        self.requests = 0
+        self.retries = 0
+
+    async def fetch(self, base_url, params):
+        url = f"{base_url}?{urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})}"
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.semaphore:
+                    self.requests += 1
+                    return await asyncio.to_thread(_get_json, url, self.timeout)
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise FeedError(f"{url}: HTTP {e.code}") from e
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                if attempt == self.max_retries:
+                    raise FeedError(f"{url}: {e}") from e
+            self.retries += 1
+            # exponential backoff with jitter, outside the semaphore so waiting does not hold a slot
+            await asyncio.sleep(self.backoff_s * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def raw_transit_frame(records):
+    # a page of raw feed records -> the column names and dtypes clean_chunk expects
+    df = pd.DataFrame.from_records(records)
+    df = df.rename(columns={c: standardize_column(c) for c in df.columns})
+    for col in STOP_COLS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    for col in ['route_number', 'route_name', 'route_destination', 'day_type', 'day', 'time_period']:
+        df[col] = df[col].astype(str).where(df[col].notna())
+    return df
+
+
+def write_weather_partitions(records, out_dir, part_name):
+    df = pd.DataFrame.from_records(records)
+    written = {}
+    for month, part in df.groupby(df['datetime'].str[:7], sort=False):
+        part_dir = month_partition_dir(out_dir, month)
+        os.makedirs(part_dir, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(part, preserve_index=False), os.path.join(part_dir, f"{part_name}.parquet"))
+        written[month] = len(part)
+    return written
+
+
+class Ingestor:
+    def __init__(self, transit_url, weather_url, out_dir, weather_dir, start_date=START_DATE, end_date=END_DATE,
+                 page_size=PAGE_SIZE, client=None, upsert=False):
+        self.urls = {'transit': transit_url, 'weather': weather_url}
+        self.dirs = {'transit': out_dir, 'weather': weather_dir}
+        self.start_date, self.end_date = start_date, end_date
+        self.page_size = page_size
+        self.client = client or FeedClient()
+        self.checkpoint = Checkpoint(os.path.join(out_dir, STATE_FILE))
+        self.index = None
+        if upsert:
+            from record_index import RecordIndex
+            self.index = RecordIndex.open(out_dir)
+        # the record index is one shared structure; page writes to it go one at a time
+        self._index_lock = asyncio.Lock()
+
+    def _store_transit(self, records, part_name):
+        chunk = clean_chunk(raw_transit_frame(records), self.start_date, self.end_date)
+        if chunk.empty:
+            return 0
+        if self.index is not None:
+            self.index.upsert(chunk, part_name)
+            return len(chunk)
+        return sum(write_month_partitions(chunk, self.dirs['transit'], part_name).values())
+
+    async def _store(self, feed, records, part_name):
+        if feed == 'weather':
+            written = await asyncio.to_thread(write_weather_partitions, records, self.dirs['weather'], part_name)
+            return sum(written.values())
+        if self.index is not None:
+            async with self._index_lock:
+                return await asyncio.to_thread(self._store_transit, records, part_name)
+        return await asyncio.to_thread(self._store_transit, records, part_name)
+
+    async def ingest_window(self, feed, month, lo, hi):
+        state = self.checkpoint.get(feed, month, lo, hi)
+        while state['pending']:
+            start, end = state['pending'][0]
+            page = await self.client.fetch(self.urls[feed], {'start': start, 'end': end, 'cursor': state['cursor'],
+                                                            'limit': self.page_size})
+            records = page.get('records', [])
+            if records:
+                # part names follow the page number, so a page re-fetched after a crash overwrites its own file
+                rows = await self._store(feed, records, f"ingest-{month}-{state['pages']:05d}")
+                state['pages'] += 1
+                state['rows'] += rows
+            state['cursor'] = page.get('next_cursor')
+            if state['cursor'] is None:
+                state['pending'].pop(0)
+            state['done'] = not state['pending']
+            self.checkpoint.save()
+        return state['rows']
+
+    async def run(self, feeds=('transit', 'weather')):
+        for d in self.dirs.values():
+            os.makedirs(d, exist_ok=True)
+        started = time.perf_counter()
+        windows = month_windows(self.start_date, self.end_date)
+        # every (feed, month) window is its own task; pages within a window follow the cursor in order
+        jobs = [(feed, w) for feed in feeds if self.urls.get(feed) for w in windows]
+        rows = await asyncio.gather(*(self.ingest_window(feed, *w) for feed, w in jobs))
+        totals = {}
+        for (feed, _), n in zip(jobs, rows):
+            totals[feed] = totals.get(feed, 0) + n
+        return {'windows': len(jobs), **{f"{feed}_rows": n for feed, n in totals.items()},
+                'requests': self.client.requests, 'retries': self.client.retries,
+                'wall_s': round(time.perf_counter() - started, 3)}
+
+
+def ingest(transit_url, weather_url, out_dir, weather_dir, start_date=START_DATE, end_date=END_DATE,
+           page_size=PAGE_SIZE, concurrency=CONCURRENCY, max_retries=MAX_RETRIES, upsert=False):
+    async def _main():
+        client = FeedClient(concurrency, max_retries)
+        ingestor = Ingestor(transit_url, weather_url, out_dir, weather_dir, start_date, end_date, page_size, client,
+                            upsert)
+        return await ingestor.run()
+
+    return asyncio.run(_main())
+
+
+class StandInFeed:
+    # local stand-in for the upstream APIs: synthetic raw transit records and hourly weather, served in
+    # cursor-paginated JSON pages; `fail_rate` answers some requests with 503 to exercise the retries
+    def __init__(self, rows=50_000, days=182, start_date=START_DATE, seed=42, fail_rate=0.0, latency_ms=0.0):
+        from synthetic_data import make_hourly_weather, make_routes, make_transit_chunk
+
+        weather = make_hourly_weather(days, start_date, seed)
+        daily = weather.assign(day=weather['datetime'].str[:10]).groupby('day')[['snow', 'windgust']].agg(
+            {'snow': 'sum', 'windgust': 'max'}).reset_index(drop=True)
+        transit = make_transit_chunk(rows, make_routes(seed=seed), daily, days, start_date, seed)
+        transit_days = pd.to_datetime(transit['Day'], format='%m/%d/%Y %I:%M:%S %p')
+        order = transit_days.argsort(kind='stable')
+        self.feeds = {
+            'transit': (transit.iloc[order].reset_index(drop=True), transit_days.iloc[order].dt.normalize().values),
+            'weather': (weather, pd.to_datetime(weather['datetime']).dt.normalize().values),
+        }
+        self.fail_rate = fail_rate
+        self.latency_ms = latency_ms
+        self.rng = random.Random(seed)
+        self.server = None
+
+    def page(self, feed, start, end, cursor, limit):
+        frame, days = self.feeds[feed]
+        lo = days.searchsorted(pd.Timestamp(start).to_datetime64(), side='left')
+        hi = days.searchsorted(pd.Timestamp(end).to_datetime64(), side='right')
+        offset = lo + int(cursor or 0)
+        stop = min(offset + limit, hi)
+        records = json.loads(frame.iloc[offset:stop].to_json(orient='records'))
+        return {'records': records, 'next_cursor': int(stop - lo) if stop < hi else None}
+
+    def start(self, host='127.0.0.1', port=0):
+        feed = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                name = url.path.strip('/')
+                if feed.latency_ms:
+                    time.sleep(feed.latency_ms / 1000)
+                if name not in feed.feeds:
+                    return self._send(404, {'error': f"unknown feed '{name}'"})
+                if feed.rng.random() < feed.fail_rate:
+                    return self._send(503, {'error': 'try again'})
+                q = dict(urllib.parse.parse_qsl(url.query))
+                body = feed.page(name, q['start'], q['end'], q.get('cursor'), int(q.get('limit', PAGE_SIZE)))
+                self._send(200, body)
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = f"http://{host}:{self.server.server_address[1]}"
+        return f"{base}/transit", f"{base}/weather"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pull paginated transit and weather feeds into month partitions.")
+    parser.add_argument("--transit-url", help="paginated on-time performance endpoint")
+    parser.add_argument("--weather-url", help="paginated hourly weather endpoint")
+    parser.add_argument("--out-dir", default="cleaned_transit_data")
+    parser.add_argument("--weather-dir", default="weather_data")
+    parser.add_argument("--start-date", default=START_DATE)
+    parser.add_argument("--end-date", default=END_DATE)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--upsert", action="store_true", help="replace rows whose natural key is already stored")
+    parser.add_argument("--stand-in", type=int, metavar="ROWS",
+                        help="serve ROWS synthetic records from a local stand-in feed and ingest from it")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="stand-in only: share of requests that get a 503")
+    args = parser.parse_args()
+
+    stand_in = None
+    if args.stand_in:
+        stand_in = StandInFeed(args.stand_in, start_date=args.start_date, fail_rate=args.fail_rate)
+        args.transit_url, args.weather_url = stand_in.start()
+        print(f"🧪 Stand-in feed: {args.transit_url}, {args.weather_url}")
+    if not (args.transit_url or args.weather_url):
+        parser.error("give --transit-url/--weather-url or --stand-in ROWS")
+    try:
+        summary = ingest(args.transit_url, args.weather_url, args.out_dir, args.weather_dir, args.start_date,
+                         args.end_date, args.page_size, args.concurrency, args.max_retries, args.upsert)
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+    print(f"✅ Ingested {summary.get('transit_rows', 0):,} transit rows and {summary.get('weather_rows', 0):,} weather "
+          f"hours over {summary['windows']} month windows ({summary['requests']} requests, {summary['retries']} "
+          f"retries, {summary['wall_s']:.1f}s)")
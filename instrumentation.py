@@ -0,0 +1,244 @@
+import atexit
+import collections
+import functools
+import json
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+
+# TRANSIT_TRACE=trace.jsonl   -> one JSON line per finished stage
+# TRANSIT_TRACE=trace.json    -> Chrome trace-event file (chrome://tracing, Perfetto), written at exit
+# TRANSIT_TRACE_PROFILE=name  -> sample call stacks while stage `name` runs, saved as <trace>.<name>.folded
+TRACE_ENV = 'TRANSIT_TRACE'
+PROFILE_ENV = 'TRANSIT_TRACE_PROFILE'
+RSS_SAMPLE_INTERVAL = 0.05
+PROFILE_INTERVAL = 0.005
+
+
+def current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # no /proc (macOS): fall back to the high-water mark
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class PeakRSSSampler:
+    # polls RSS on a thread so the peak is the stage's own, not whatever ran before it
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class StackSampler:
+    # SIGPROF-driven sampling profiler: records the main thread's stack every `interval` of CPU time
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.active = False
+
+    def _handle(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        self.counts[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        if hasattr(signal, 'SIGPROF') and threading.current_thread() is threading.main_thread():
+            self._previous = signal.signal(signal.SIGPROF, self._handle)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+            self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        if self.active:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous)
+
+    def write_folded(self, path):
+        # folded-stack format, readable by flamegraph.pl / speedscope
+        with open(path, 'w') as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, data=None, **attrs):
+        if data is not None and hasattr(data, 'shape'):
+            shape = data.shape
+            attrs.setdefault('rows', int(shape[0]))
+            if len(shape) > 1:
+                attrs.setdefault('cols', int(shape[1]))
+        self.attrs.update(attrs)
+
+
+class _NullStage:
+    def __enter__(self):
+        return _NULL_SPAN
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullSpan:
+    def set(self, data=None, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, path=None, profile_stage=None):
+        self.path = path
+        self.enabled = path is not None
+        self.chrome = bool(path) and path.endswith('.json')
+        self.profile_stage = profile_stage
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+        if self.chrome:
+            # worker processes (train_all, tuning) inherit the env var; each writes its own file
+            root = os.environ.setdefault('TRANSIT_TRACE_ROOT_PID', str(os.getpid()))
+            if root != str(os.getpid()):
+                stem, ext = os.path.splitext(path)
+                self.path = f"{stem}.{os.getpid()}{ext}"
+            atexit.register(self.flush)
+
+    def stage(self, name, data=None, **attrs):
+        if not self.enabled:
+            return _NullStage()
+        return self._stage(name, data, attrs)
+
+    def _stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def _stage(self, name, data, attrs):
+        tracer = self
+
+        class _Stage:
+            def __enter__(self):
+                self.span = Span(name, dict(attrs))
+                self.span.set(data)
+                stack = tracer._stack()
+                self.parent = stack[-1] if stack else None
+                stack.append(name)
+                self.profiler = StackSampler() if name == tracer.profile_stage else None
+                self.mem = PeakRSSSampler(RSS_SAMPLE_INTERVAL).__enter__()
+                if self.profiler:
+                    self.profiler.__enter__()
+                self.wall = time.perf_counter()
+                self.cpu = time.process_time()
+                return self.span
+
+            def __exit__(self, exc_type, exc, tb):
+                wall = time.perf_counter() - self.wall
+                cpu = time.process_time() - self.cpu
+                if self.profiler:
+                    self.profiler.__exit__(exc_type, exc, tb)
+                    self.profiler.write_folded(f"{tracer.path}.{name}.folded")
+                self.mem.__exit__(exc_type, exc, tb)
+                tracer._stack().pop()
+                tracer._record({
+                    'name': name, 'parent': self.parent, 'start_s': round(self.wall - tracer.origin, 6),
+                    'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+                    'rss_before_mb': round(self.mem.baseline / 2**20, 2),
+                    'peak_rss_mb': round(self.mem.peak / 2**20, 2),
+                    'ok': exc_type is None, 'pid': os.getpid(), 'tid': threading.get_ident(),
+                    **self.span.attrs,
+                })
+                return False
+
+        return _Stage()
+
+    def _record(self, event):
+        with self.lock:
+            if self.chrome:
+                self.events.append(event)
+            else:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(event, default=str) + '\n')
+
+    def flush(self):
+        if not self.chrome:
+            return
+        with self.lock:
+            trace = [{
+                'name': e['name'], 'ph': 'X', 'pid': e['pid'], 'tid': e['tid'],
+                'ts': e['start_s'] * 1e6, 'dur': e['wall_s'] * 1e6,
+                'args': {k: v for k, v in e.items() if k not in ('name', 'pid', 'tid', 'start_s', 'wall_s')},
+            } for e in self.events]
+            with open(self.path, 'w') as f:
+                json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+_tracer = None
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(os.environ.get(TRACE_ENV) or None, os.environ.get(PROFILE_ENV) or None)
+    return _tracer
+
+
+def configure(path=None, profile_stage=None):
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+    _tracer = Tracer(path, profile_stage)
+    return _tracer
+
+
+def trace_stage(name, data=None, **attrs):
+    return get_tracer().stage(name, data, **attrs)
+
+
+def traced(name, data=None):
+    # data(*args, **kwargs) picks the object whose .shape gives rows/cols for the span
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.stage(name) as span:
+                result = fn(*args, **kwargs)
+                if data is not None:
+                    span.set(data(*args, **kwargs))
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,87 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+REQUEST_FIELDS = ['route_number', 'route_name', 'route_destination', 'day_type', 'time_period',
+                  'temp', 'humidity', 'precip', 'snow', 'windspeed', 'visibility']
+
+
+def sample_records(csv_path, n=2000, seed=42):
+    df = pd.read_csv(csv_path, usecols=lambda c: c in REQUEST_FIELDS, nrows=50_000)
+    df = df.sample(min(n, len(df)), random_state=seed)
+    return json.loads(df.to_json(orient='records'))
+
+
+def _post(url, records):
+    body = json.dumps({'records': records}).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def run_load(base_url, records, concurrency=16, duration_s=10.0, rows_per_request=1, seed=42):
+    url = base_url.rstrip('/') + '/predict'
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration_s
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        local = []
+        while time.perf_counter() < stop_at:
+            batch = rng.sample(records, rows_per_request)
+            start = time.perf_counter()
+            try:
+                _post(url, batch)
+                local.append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    lat = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'requests_per_s': round(len(latencies) / elapsed, 2),
+        'rows_per_s': round(len(latencies) * rows_per_request / elapsed, 2),
+        'client_p50_ms': round(float(np.percentile(lat, 50)), 3) if len(lat) else None,
+        'client_p99_ms': round(float(np.percentile(lat, 99)), 3) if len(lat) else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate concurrent scoring traffic against scoring_service.py.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--data", default="merged_transit_weather.csv", help="CSV to sample request records from")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rows-per-request", type=int, default=1)
+    args = parser.parse_args()
+
+    records = sample_records(args.data)
+    result = run_load(args.url, records, args.concurrency, args.duration, args.rows_per_request)
+    print("\n📈 Client-side results")
+    for k, v in result.items():
+        print(f"  {k}: {v}")
+
+    with urllib.request.urlopen(args.url.rstrip('/') + '/metrics', timeout=10) as resp:
+        print("\n📊 Server metrics")
+        for k, v in json.loads(resp.read()).items():
+            print(f"  {k}: {v}")
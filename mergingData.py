@@ -1,39 +1,9 @@
-import pandas as pd
+from transit_weather_join import join_transit_weather
 
-# Load transit and weather data
-transit_df = pd.read_csv('cleaned_transit_data.csv')  # adjust filename if needed
-weather_df = pd.read_csv('/Users/ahmedhasan/desktop/weather_data.csv')
+# Join each transit interval (day + time_period) to the hourly weather readings it covers.
+# The transit side can be the cleaned CSV or the month-partitioned output of streaming_cleaner.py;
+# it is processed one partition/chunk at a time.
+transit_source = 'cleaned_transit_data.csv'  # adjust filename if needed
+weather_path = '/Users/ahmedhasan/desktop/weather_data.csv'
 
-# Check column names
-print("Transit Columns:", transit_df.columns)
-print("Weather Columns:", weather_df.columns)
-
-# Create datetime column in transit_df by combining 'day' and 'time_period'
-transit_df['datetime'] = pd.to_datetime(
-    transit_df['day'].astype(str) + ' ' + transit_df['time_period'].astype(str),
-    errors='coerce',
-    utc=True
-)
-
-# Convert weather datetime to pandas datetime (UTC)
-weather_df['datetime'] = pd.to_datetime(weather_df['datetime'], errors='coerce', utc=True)
-
-# Drop rows with invalid datetime values
-transit_df.dropna(subset=['datetime'], inplace=True)
-weather_df.dropna(subset=['datetime'], inplace=True)
-
-# Extract date only from datetime for merging
-transit_df['date'] = transit_df['datetime'].dt.date
-weather_df['date'] = weather_df['datetime'].dt.date
-
-# Merge on 'date' column
-merged_df = pd.merge(transit_df, weather_df, on='date', how='inner')
-
-# Save merged data
-merged_df.to_csv('merged_transit_weather.csv', index=False)
-
-# Debug output
-print("Merged data saved as 'merged_transit_weather.csv'")
-print("Sample transit datetimes:\n", transit_df['datetime'].head(10))
-print("Sample weather datetimes:\n", weather_df['datetime'].head(10))
-print("Merged Data Sample:\n", merged_df.head())
+join_transit_weather(transit_source, weather_path, 'merged_transit_weather.csv')
@@ -1,12 +1,27 @@
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, mean_squared_error, mean_absolute_error, r2_score
 import numpy as np
+from instrumentation import trace_stage
 
-def train_linear_regression(X_train, X_test, y_train, y_test):
-    model = LinearRegression()
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
+def train_linear_regression(X_train, X_test, y_train, y_test, n_jobs=None):
+    model = LinearRegression(n_jobs=n_jobs)
+    with trace_stage('linear_regression.fit', X_train):
+        model.fit(X_train, y_train)
+    with trace_stage('linear_regression.predict', X_test):
+        preds = model.predict(X_test)
     print("\n📊 Linear Regression Results")
     print(f"✅ MAE : {mean_absolute_error(y_test, preds):.2f}")
     print(f"✅ RMSE: {np.sqrt(mean_squared_error(y_test, preds)):.2f}")
-    print(f"✅ R2  : {r2_score(y_test, preds):.4f}")
\ No newline at end of file
+    print(f"✅ R2  : {r2_score(y_test, preds):.4f}")
+    return model
+
+def train_logistic_regression(X_train, X_test, y_train, y_test):
+    model = LogisticRegression(max_iter=1000)
+    with trace_stage('logistic_regression.fit', X_train):
+        model.fit(X_train, y_train)
+    with trace_stage('logistic_regression.predict', X_test):
+        preds = model.predict(X_test)
+    print("\n📊 Logistic Regression Results")
+    print("✅ Accuracy:", accuracy_score(y_test, preds))
+    print("\nClassification Report:\n", classification_report(y_test, preds))
+    return model
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+from importlib import metadata
+
+import numpy as np
+
+from data_cache import CACHE_DIR, load_frame
+from preprocessing import (CLASS_TARGET, PIPELINE_VERSION, REG_TARGET, TransitPreprocessor, load_feature_matrix,
+                           on_time_status)
+
+MODEL_KINDS = ('xgb', 'rf', 'linear')
+# bump when the manifest layout or a model file format changes; 1 = bare file names, sklearn wrappers
+ARTIFACT_VERSION = 2
+
+
+def _train_serving_models(features, kind):
+    X_train, X_test, y_train, y_test = features.context_split(REG_TARGET)
+    Xc_train, Xc_test, yc_train, yc_test = features.context_split(CLASS_TARGET)
+
+    if kind == 'xgb':
+        from xgboost import XGBClassifier, XGBRegressor
+        reg = XGBRegressor(random_state=42).fit(X_train, y_train)
+        clf = XGBClassifier(eval_metric='logloss', random_state=42).fit(Xc_train, yc_train)
+    elif kind == 'rf':
+        from model_rf import train_rf_classifier, train_rf_regressor
+        reg = train_rf_regressor(X_train, X_test, y_train, y_test)
+        clf = train_rf_classifier(Xc_train, Xc_test, yc_train, yc_test)
+    else:
+        from model_linear import train_linear_regression, train_logistic_regression
+        reg = train_linear_regression(X_train, X_test, y_train, y_test)
+        clf = train_logistic_regression(Xc_train, Xc_test, yc_train, yc_test)
+    return {REG_TARGET: reg, CLASS_TARGET: clf}
+
+
+def _save_model(model, out_dir, target, kind):
+    if kind == 'xgb':
+        # native UBJSON: loads into a bare Booster, no sklearn wrapper needed at serving time
+        name = f"{target}.ubj"
+        model.save_model(os.path.join(out_dir, name))
+        return {'file': name, 'format': 'xgboost-ubj'}
+    if kind == 'linear':
+        # [coef..., intercept] as float64 .npy, memory-mapped on load
+        name = f"{target}.npy"
+        weights = np.append(np.ravel(model.coef_), np.ravel(model.intercept_)).astype(np.float64)
+        np.save(os.path.join(out_dir, name), weights)
+        return {'file': name, 'format': 'linear-npy', 'link': 'logistic' if target == CLASS_TARGET else 'identity'}
+    import joblib
+    # uncompressed, so joblib can memory-map the tree arrays instead of copying them
+    name = f"{target}.joblib"
+    joblib.dump(model, os.path.join(out_dir, name))
+    return {'file': name, 'format': 'joblib'}
+
+
+def _library_versions(kind):
+    packages = {'xgb': ['xgboost'], 'rf': ['scikit-learn', 'joblib'], 'linear': ['numpy']}[kind]
+    return {p: metadata.version(p) for p in packages}
+
+
+def holdout_keys(csv_path, features, cache_dir=CACHE_DIR):
+    # natural-key hashes of the matrix's test rows, the ones no saved model trained on; route_shards.py compares
+    # shard models with the global model on exactly these
+    from record_index import key_hashes
+    from sparse_features import split_rows
+    from transit_schema import KEY_PARTS
+
+    keys = load_frame(csv_path, cache_dir, columns=KEY_PARTS)
+    if len(keys) != len(features.values):
+        raise ValueError(f"'{csv_path}' has {len(keys):,} rows but the feature matrix {len(features.values):,}.")
+    _, test_idx = split_rows(len(keys))
+    return np.sort(key_hashes(keys.iloc[test_idx]))
+
+
+def training_profile(features):
+    # what a what-if scenario fills unset columns with: the training rows' median (numeric) or most common label
+    # (categorical), plus the route / name / destination combinations that actually ran
+    pre = features.preprocessor
+    columns = pre.context_columns
+    X = features.values[:features.n_train, 1:1 + len(columns)]
+    defaults = {}
+    for j, col in enumerate(columns):
+        if col in pre.categories:
+            codes = X[:, j].astype(np.int64)
+            codes = codes[codes >= 0]
+            defaults[col] = pre.categories[col][int(np.bincount(codes).argmax())] if len(codes) else None
+        else:
+            defaults[col] = float(np.median(X[:, j])) if len(X) else 0.0
+    route_cols = [c for c in ('route_number', 'route_name', 'route_destination') if c in columns]
+    routes = []
+    if route_cols:
+        idx = [1 + columns.index(c) for c in route_cols]
+        combos = np.unique(features.values[:, idx].astype(np.int64), axis=0)
+        routes = [{c: pre.categories[c][k] for c, k in zip(route_cols, row)} for row in combos]
+    return defaults, routes
+
+
+def save_serving_models(features, out_dir, kind='xgb', weather_store=None, holdout=None):
+    os.makedirs(out_dir, exist_ok=True)
+    models = _train_serving_models(features, kind)
+    defaults, routes = training_profile(features)
+    manifest = {
+        'format_version': ARTIFACT_VERSION,
+        'kind': kind,
+        # column order the encoded matrix is built in; every model below was fitted on exactly this order
+        'features': features.preprocessor.context_columns,
+        'encoders': {'file': 'preprocessor.json', 'pipeline_version': PIPELINE_VERSION},
+        'libraries': _library_versions(kind),
+        'models': {},
+        'defaults': defaults,
+        'routes': routes,
+    }
+    for target, model in models.items():
+        if model is not None:
+            manifest['models'][target] = _save_model(model, out_dir, target, kind)
+    if weather_store is not None:
+        # shipped with the models: serving looks weather features up by the request's timestamp
+        from weather_features import WEATHER_FEATURE_VERSION
+        weather_store.save(os.path.join(out_dir, 'weather_features.feather'))
+        manifest['weather_features'] = {'file': 'weather_features.feather', 'version': WEATHER_FEATURE_VERSION}
+    if holdout is not None:
+        np.save(os.path.join(out_dir, 'holdout_keys.npy'), holdout)
+        manifest['holdout'] = {'file': 'holdout_keys.npy', 'rows': int(len(holdout))}
+    features.preprocessor.save(os.path.join(out_dir, 'preprocessor.json'))
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Serving models saved to '{out_dir}'")
+    return manifest
+
+
+def load_training_matrix(csv_path, weather_path=None, cache_dir=CACHE_DIR):
+    store, variant = None, ''
+    if weather_path:
+        from weather_features import load_weather_store, weather_store_path
+        store = load_weather_store(weather_path, cache_dir)
+        if cache_dir is not None:
+            # cached matrices are keyed by the weather series too, not just the transit CSV
+            name = os.path.splitext(os.path.basename(weather_store_path(weather_path, cache_dir)))[0]
+            digest, version = name.rsplit('-', 2)[1:]
+            variant = f"+wx{digest[:12]}{version}"
+
+    def _frame():
+        df = load_frame(csv_path, cache_dir)
+        df[CLASS_TARGET] = on_time_status(df)
+        return store.attach(df) if store is not None else df
+
+    return load_feature_matrix(csv_path, _frame, cache_dir, variant), store
+
+
+class _BoosterModel:
+    def __init__(self, path):
+        import xgboost as xgb
+        self.booster = xgb.Booster(model_file=path)
+
+    def predict(self, X):
+        # binary:logistic boosters already return the positive-class probability
+        return self.booster.inplace_predict(X)
+
+
+class _LinearModel:
+    def __init__(self, path, link):
+        self.weights = np.load(path, mmap_mode='r')
+        self.link = link
+
+    def predict(self, X):
+        z = np.asarray(X, dtype=np.float64) @ self.weights[:-1] + self.weights[-1]
+        return 1.0 / (1.0 + np.exp(-z)) if self.link == 'logistic' else z
+
+
+class _JoblibModel:
+    def __init__(self, path, target):
+        import joblib
+        self.model = joblib.load(path, mmap_mode='r')
+        self.target = target
+
+    def predict(self, X):
+        if self.target == CLASS_TARGET:
+            return self.model.predict_proba(X)[:, 1]
+        return self.model.predict(X)
+
+
+def load_model(model_dir, entry, target):
+    if isinstance(entry, str):
+        # format 1 manifests only stored the file name
+        entry = {'file': entry, 'format': 'xgboost-ubj' if entry.endswith('.ubj') else 'joblib'}
+    path = os.path.join(model_dir, entry['file'])
+    if entry['format'] == 'xgboost-ubj':
+        return _BoosterModel(path)
+    if entry['format'] == 'linear-npy':
+        return _LinearModel(path, entry['link'])
+    if entry['format'] == 'joblib':
+        return _JoblibModel(path, target)
+    raise ValueError(f"Unknown model format '{entry['format']}' in {model_dir}")
+
+
+class ServingModels:
+    def __init__(self, model_dir):
+        with open(os.path.join(model_dir, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        version = self.manifest.get('format_version', 1)
+        if version > ARTIFACT_VERSION:
+            raise ValueError(f"Artifact format {version} is newer than this code ({ARTIFACT_VERSION}); upgrade first.")
+        self.preprocessor = TransitPreprocessor.load(os.path.join(model_dir, 'preprocessor.json'))
+        self.features = self.manifest['features']
+        self.models = {target: load_model(model_dir, entry, target) for target, entry in self.manifest['models'].items()}
+        self.weather_store = None
+        if 'weather_features' in self.manifest:
+            from weather_features import WeatherFeatureStore
+            entry = self.manifest['weather_features']
+            self.weather_store = WeatherFeatureStore.read(os.path.join(model_dir, entry['file']))
+
+    def encode(self, df):
+        if self.weather_store is not None:
+            df = self.weather_store.attach(df)
+        # same encoding as preprocess_all: a missing numeric field becomes 0 just like fillna(0), a missing
+        # categorical the same code as a missing or unseen label
+        return self.preprocessor.transform(df, columns=self.features)
+
+    def predict_matrix(self, X):
+        out = {}
+        if REG_TARGET in self.models:
+            out[REG_TARGET] = self.models[REG_TARGET].predict(X)
+        if CLASS_TARGET in self.models:
+            out['on_time_probability'] = self.models[CLASS_TARGET].predict(X)
+        return out
+
+    def predict(self, df):
+        return self.predict_matrix(self.encode(df))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and persist the context-only models used for scoring.")
+    parser.add_argument("csv_path", nargs="?", default="merged_transit_weather.csv")
+    parser.add_argument("--out", default="models")
+    parser.add_argument("--kind", choices=MODEL_KINDS, default="xgb")
+    parser.add_argument("--weather", help="hourly weather CSV/directory: add lagged and rolling weather features")
+    args = parser.parse_args()
+
+    features, store = load_training_matrix(args.csv_path, args.weather)
+    save_serving_models(features, args.out, args.kind, store, holdout_keys(args.csv_path, features))
@@ -1,69 +1,54 @@
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report, mean_squared_error, mean_absolute_error, r2_score
 from xgboost import XGBClassifier, XGBRegressor
-from sklearn.preprocessing import LabelEncoder
+from data_cache import CACHE_DIR, load_frame
+from instrumentation import trace_stage, traced
+from preprocessing import load_feature_matrix, on_time_status
 
 class XGBoostTrainer:
-    def __init__(self, csv_path):
+    def __init__(self, csv_path, cache_dir=CACHE_DIR):
         self.csv_path = csv_path
+        self.cache_dir = cache_dir
         self.df = None
+        self.features = None
         self.classifier_model = None
         self.regressor_model = None
         self.X_train_class = self.X_test_class = self.y_train_class = self.y_test_class = None
         self.X_train_reg = self.X_test_reg = self.y_train_reg = self.y_test_reg = None
 
+    @traced('xgb.load_data', data=lambda self: self.df)
     def load_data(self):
         try:
-            self.df = pd.read_csv(self.csv_path)
+            self.df = load_frame(self.csv_path, self.cache_dir)
             print("✅ Data loaded.")
         except FileNotFoundError:
             print("❌ File not found.")
 
+    @traced('xgb.create_on_time_status', data=lambda self: self.df)
     def create_on_time_status(self):
         if self.df is not None:
-            self.df['on_time_status'] = self.df['on-time_stops'] > (self.df['early_stops'] + self.df['late_stops'])
-            self.df['on_time_status'] = self.df['on_time_status'].astype(int)
+            self.df['on_time_status'] = on_time_status(self.df)
             print("✅ 'on_time_status' column created.")
 
+    @traced('xgb.preprocess_data', data=lambda self: self.features.values if self.features is not None else None)
     def preprocess_data(self):
         if self.df is None:
             print("❌ Load data first.")
             return
 
-        drop_cols = ['key', 'datetime_x', 'datetime_y', 'date', 'day', 'tempmax', 'tempmin', 'dew', 'windgust']
-        self.df.drop(columns=drop_cols, inplace=True, errors='ignore')
-
-        # Encode object columns
-        obj_cols = self.df.select_dtypes(include='object').columns
-        for col in obj_cols:
-            self.df[col] = LabelEncoder().fit_transform(self.df[col].astype(str))
-
-        self.df.fillna(0, inplace=True)
-
-        # Classification prep
-        if 'on_time_status' in self.df.columns:
-            X_class = self.df.drop(columns=['on_time_status'])
-            y_class = self.df['on_time_status']
-            self.X_train_class, self.X_test_class, self.y_train_class, self.y_test_class = train_test_split(
-                X_class, y_class, test_size=0.2, random_state=42
-            )
-
-        # Regression prep
-        if 'late_stops' in self.df.columns:
-            X_reg = self.df.drop(columns=['late_stops'])
-            y_reg = self.df['late_stops']
-            self.X_train_reg, self.X_test_reg, self.y_train_reg, self.y_test_reg = train_test_split(
-                X_reg, y_reg, test_size=0.2, random_state=42
-            )
+        # shared with TransitDataProcessor: encoders fitted once, cached matrix, views per target
+        self.features = load_feature_matrix(self.csv_path, lambda: self.df, self.cache_dir)
+        self.X_train_class, self.X_test_class, self.y_train_class, self.y_test_class = self.features.classification_split()
+        self.X_train_reg, self.X_test_reg, self.y_train_reg, self.y_test_reg = self.features.regression_split()
 
         print("✅ Data preprocessed.")
 
-    def train_xgb_classifier(self):
-        self.classifier_model = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
-        self.classifier_model.fit(self.X_train_class, self.y_train_class)
-        preds = self.classifier_model.predict(self.X_test_class)
+    def train_xgb_classifier(self, n_jobs=None):
+        self.classifier_model = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42, n_jobs=n_jobs)
+        with trace_stage('xgb_classifier.fit', self.X_train_class):
+            self.classifier_model.fit(self.X_train_class, self.y_train_class)
+        with trace_stage('xgb_classifier.predict', self.X_test_class):
+            preds = self.classifier_model.predict(self.X_test_class)
 
         acc = accuracy_score(self.y_test_class, preds)
         print("\n📊 XGBoost Classifier Results")
@@ -71,10 +56,12 @@ class XGBoostTrainer:
         print("Classification Report:")
         print(classification_report(self.y_test_class, preds))
 
-    def train_xgb_regressor(self):
-        self.regressor_model = XGBRegressor(random_state=42)
-        self.regressor_model.fit(self.X_train_reg, self.y_train_reg)
-        preds = self.regressor_model.predict(self.X_test_reg)
+    def train_xgb_regressor(self, n_jobs=None):
+        self.regressor_model = XGBRegressor(random_state=42, n_jobs=n_jobs)
+        with trace_stage('xgb_regressor.fit', self.X_train_reg):
+            self.regressor_model.fit(self.X_train_reg, self.y_train_reg)
+        with trace_stage('xgb_regressor.predict', self.X_test_reg):
+            preds = self.regressor_model.predict(self.X_test_reg)
 
         mae = mean_absolute_error(self.y_test_reg, preds)
         rmse = np.sqrt(mean_squared_error(self.y_test_reg, preds))
@@ -0,0 +1,202 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import xgboost as xgb
+
+from evaluation import classification_metrics, regression_metrics
+from instrumentation import PeakRSSSampler, trace_stage
+from preprocessing import CLASS_TARGET, REG_TARGET, TransitPreprocessor, on_time_status
+from streaming_cleaner import list_month_partitions, list_partition_files
+from transit_schema import table_to_frame
+
+BATCH_ROWS = 250_000
+EVAL_MONTHS = 1
+NUM_ROUNDS = 100
+# same defaults XGBClassifier / XGBRegressor train with in model_xgb.py
+XGB_PARAMS = {'tree_method': 'hist', 'seed': 42, 'max_bin': 256}
+OBJECTIVES = {REG_TARGET: 'reg:squarederror', CLASS_TARGET: 'binary:logistic'}
+
+
+def split_partitions(store_dir, eval_months=EVAL_MONTHS):
+    # hold out whole month partitions (the most recent ones) instead of sampling rows
+    months = list_month_partitions(store_dir)
+    if len(months) <= eval_months:
+        raise ValueError(f"Need more than {eval_months} month partitions, found {len(months)}.")
+    return list_partition_files(store_dir, months[:-eval_months]), list_partition_files(store_dir, months[-eval_months:])
+
+
+def iter_frames(files, batch_rows=BATCH_ROWS):
+    # one Parquet record batch at a time; nothing here ever holds more than batch_rows rows
+    for path in files:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+            df = table_to_frame(pa.Table.from_batches([batch]))
+            if CLASS_TARGET not in df.columns:
+                df[CLASS_TARGET] = on_time_status(df)
+            yield df
+
+
+def _read_frame(files):
+    df = table_to_frame(ds.dataset(files, format='parquet').to_table())
+    if CLASS_TARGET not in df.columns:
+        df[CLASS_TARGET] = on_time_status(df)
+    return df
+
+
+def fit_streaming(files, batch_rows=BATCH_ROWS):
+    # vocabularies are collected batch by batch, then sorted: the same encoders fit() gives on the full frame
+    pre = None
+    for df in iter_frames(files, batch_rows):
+        pre = TransitPreprocessor().fit(df) if pre is None else pre.partial_fit(df)
+    if pre is None:
+        raise ValueError("No training rows found.")
+    pre.categories = {col: sorted(labels) for col, labels in pre.categories.items()}
+    return pre
+
+
+def _target_split(values, target):
+    # same column ranges as FeatureMatrix.regression_split / classification_split
+    if target == REG_TARGET:
+        return values[:, 1:], values[:, 0]
+    return values[:, :-1], values[:, -1]
+
+
+class PartitionIter(xgb.DataIter):
+    def __init__(self, files, preprocessor, target, batch_rows=BATCH_ROWS, cache_prefix=None):
+        self.files = files
+        self.preprocessor = preprocessor
+        self.target = target
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._frames = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._frames is None:
+            self._frames = iter_frames(self.files, self.batch_rows)
+        df = next(self._frames, None)
+        if df is None:
+            return False
+        X, y = _target_split(self.preprocessor.transform(df), self.target)
+        self.rows += len(X)
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self):
+        self._frames = None
+        self.rows = 0
+
+
+def external_matrix(files, preprocessor, target, cache_dir, batch_rows=BATCH_ROWS):
+    it = PartitionIter(files, preprocessor, target, batch_rows, cache_prefix=os.path.join(cache_dir, target))
+    if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+        # quantised pages live in the cache; only one batch of raw rows is in memory at a time
+        return xgb.ExtMemQuantileDMatrix(it, max_bin=XGB_PARAMS['max_bin'])
+    # older XGBoost: a DMatrix built from an iterator with cache_prefix is paged to disk the same way
+    return xgb.DMatrix(it)
+
+
+def evaluate_streaming(booster, files, preprocessor, target, batch_rows=BATCH_ROWS):
+    y_true, y_pred = [], []
+    for df in iter_frames(files, batch_rows):
+        X, y = _target_split(preprocessor.transform(df), target)
+        y_true.append(y)
+        y_pred.append(booster.predict(xgb.DMatrix(X)))
+    y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+    if target == REG_TARGET:
+        return regression_metrics(y_true, y_pred)
+    return classification_metrics(y_true.astype(int), (y_pred > 0.5).astype(int))
+
+
+def train_out_of_core(store_dir, eval_months=EVAL_MONTHS, batch_rows=BATCH_ROWS, num_rounds=NUM_ROUNDS,
+                      nthread=None, cache_dir=None):
+    train_files, eval_files = split_partitions(store_dir, eval_months)
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix='xgb-extmem-')
+    os.makedirs(cache_dir, exist_ok=True)
+    results = {}
+    try:
+        with trace_stage('ooc.fit_encoders'):
+            preprocessor = fit_streaming(train_files, batch_rows)
+        for target, objective in OBJECTIVES.items():
+            started = time.perf_counter()
+            with trace_stage(f'ooc.{target}.matrix'):
+                dtrain = external_matrix(train_files, preprocessor, target, cache_dir, batch_rows)
+            with trace_stage(f'ooc.{target}.train', rows=dtrain.num_row(), cols=dtrain.num_col()):
+                booster = xgb.train(dict(XGB_PARAMS, objective=objective, nthread=nthread or 0), dtrain, num_rounds)
+            with trace_stage(f'ooc.{target}.evaluate'):
+                metrics = evaluate_streaming(booster, eval_files, preprocessor, target, batch_rows)
+            results[target] = {'booster': booster, 'rows': dtrain.num_row(),
+                               'wall_s': time.perf_counter() - started, **metrics}
+            del dtrain
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return preprocessor, results
+
+
+def train_in_memory(store_dir, eval_months=EVAL_MONTHS, num_rounds=NUM_ROUNDS, nthread=None):
+    # reference path: the whole training history as one frame, then one DMatrix per target
+    train_files, eval_files = split_partitions(store_dir, eval_months)
+    train_df, eval_df = _read_frame(train_files), _read_frame(eval_files)
+    preprocessor = TransitPreprocessor().fit(train_df)
+    values, eval_values = preprocessor.transform(train_df), preprocessor.transform(eval_df)
+    results = {}
+    for target, objective in OBJECTIVES.items():
+        started = time.perf_counter()
+        X, y = _target_split(values, target)
+        booster = xgb.train(dict(XGB_PARAMS, objective=objective, nthread=nthread or 0), xgb.DMatrix(X, y), num_rounds)
+        X_eval, y_eval = _target_split(eval_values, target)
+        preds = booster.predict(xgb.DMatrix(X_eval))
+        metrics = (regression_metrics(y_eval, preds) if target == REG_TARGET
+                   else classification_metrics(y_eval.astype(int), (preds > 0.5).astype(int)))
+        results[target] = {'booster': booster, 'rows': len(X), 'wall_s': time.perf_counter() - started, **metrics}
+    return preprocessor, results
+
+
+def compare_with_in_memory(store_dir, eval_months=EVAL_MONTHS, batch_rows=BATCH_ROWS, num_rounds=NUM_ROUNDS,
+                           nthread=None):
+    rows = []
+    for mode in ('out_of_core', 'in_memory'):
+        with PeakRSSSampler() as mem:
+            if mode == 'out_of_core':
+                _, results = train_out_of_core(store_dir, eval_months, batch_rows, num_rounds, nthread)
+            else:
+                _, results = train_in_memory(store_dir, eval_months, num_rounds, nthread)
+        for target, result in results.items():
+            metrics = {k: v for k, v in result.items() if k != 'booster'}
+            rows.append({'mode': mode, 'target': target, **metrics,
+                         'peak_rss_growth_mb': round((mem.peak - mem.baseline) / 2**20, 1)})
+    return pd.DataFrame(rows).set_index(['target', 'mode']).sort_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train XGBoost by streaming month partitions through external memory.")
+    parser.add_argument("store_dir", help="month-partitioned Parquet store (merged or cleaned)")
+    parser.add_argument("--out", default="models_ooc", help="where to save the boosters and encoders")
+    parser.add_argument("--eval-months", type=int, default=EVAL_MONTHS, help="most recent months held out")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--rounds", type=int, default=NUM_ROUNDS)
+    parser.add_argument("--nthread", type=int, default=None)
+    parser.add_argument("--compare", action="store_true", help="also train in memory and compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        table = compare_with_in_memory(args.store_dir, args.eval_months, args.batch_rows, args.rounds, args.nthread)
+        print("\n📊 Out-of-core vs in-memory (scored on the held-out months)")
+        print(table.round(4).to_string())
+    else:
+        preprocessor, results = train_out_of_core(args.store_dir, args.eval_months, args.batch_rows, args.rounds,
+                                                  args.nthread)
+        os.makedirs(args.out, exist_ok=True)
+        preprocessor.save(os.path.join(args.out, 'preprocessor.json'))
+        for target, result in results.items():
+            result['booster'].save_model(os.path.join(args.out, f"xgb_{target}.ubj"))
+            scores = ', '.join(f"{k}={v:.4f}" for k, v in result.items() if k not in ('booster', 'rows', 'wall_s'))
+            print(f"✅ {target}: {result['rows']:,} rows streamed in {result['wall_s']:.1f}s  ({scores})")
+        print(f"✅ Models saved to '{args.out}'")
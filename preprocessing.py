@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR, source_digest
+from instrumentation import trace_stage
+
+# bump whenever fit/transform or the matrix layout changes
+PIPELINE_VERSION = 1
+
+DROP_COLS = ['key', 'datetime_x', 'datetime_y', 'date', 'day', 'tempmax', 'tempmin', 'dew', 'windgust']
+REG_TARGET = 'late_stops'
+CLASS_TARGET = 'on_time_status'
+STOP_FEATURES = ['early_stops', 'on-time_stops']
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+
+def on_time_status(df):
+    return (df['on-time_stops'] > (df['early_stops'] + df['late_stops'])).astype(int)
+
+
+def _as_labels(values):
+    # same labels LabelEncoder saw from astype(str), missing values included as 'nan'
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes, [str(u) for u in uniques]
+
+
+class TransitPreprocessor:
+    def __init__(self):
+        self.categories = {}
+        self.columns = []
+
+    def fit(self, df):
+        kept = [c for c in df.columns if c not in DROP_COLS]
+        self.categories = {}
+        for col in kept:
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                _, labels = _as_labels(df[col])
+                self.categories[col] = sorted(set(labels))
+
+        # matrix layout: [late_stops | context... | stop counts | on_time_status]
+        # so both targets (and the context-only slice) are plain column ranges of one array
+        stops = [c for c in STOP_FEATURES if c in kept]
+        context = [c for c in kept if c not in stops and c not in (REG_TARGET, CLASS_TARGET)]
+        self.columns = [REG_TARGET] + context + stops + [CLASS_TARGET]
+        return self
+
+    @property
+    def context_columns(self):
+        return [c for c in self.columns[1:-1] if c not in STOP_FEATURES]
+
+    def encode(self, col, values):
+        codes, labels = _as_labels(values)
+        lookup = pd.Index(self.categories[col]).get_indexer(labels)
+        return lookup[codes] if len(codes) else np.empty(0, dtype=np.int64)
+
+    def partial_fit(self, df):
+        # grow vocabularies in place; existing codes never move, so already-encoded rows stay valid
+        for col, known in self.categories.items():
+            if col in df.columns:
+                _, labels = _as_labels(df[col])
+                seen = set(known)
+                known.extend(sorted(lbl for lbl in set(labels) if lbl not in seen))
+        return self
+
+    def transform(self, df, columns=None, out=None):
+        columns = self.columns if columns is None else columns
+        if out is None:
+            out = np.zeros((len(df), len(columns)), dtype=np.float32)
+        with trace_stage('preprocess.encode', out):
+            for j, col in enumerate(columns):
+                if col == CLASS_TARGET and col not in df.columns and REG_TARGET in df.columns:
+                    out[:, j] = on_time_status(df)
+                elif col in self.categories:
+                    # an absent categorical is a missing label ('nan' if training saw one, else unseen), never code 0
+                    values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+                    out[:, j] = self.encode(col, values)
+                elif col not in df.columns:
+                    out[:, j] = 0
+                else:
+                    out[:, j] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+        with trace_stage('preprocess.fillna', out):
+            np.nan_to_num(out, copy=False, nan=0.0)
+        return out
+
+    def to_dict(self):
+        return {'version': PIPELINE_VERSION, 'columns': self.columns, 'categories': self.categories}
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get('version') != PIPELINE_VERSION:
+            raise ValueError(f"Preprocessor version {state.get('version')} != {PIPELINE_VERSION}; refit it.")
+        pre = cls()
+        pre.columns = list(state['columns'])
+        pre.categories = {k: list(v) for k, v in state['categories'].items()}
+        return pre
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class FeatureMatrix:
+    # rows are stored train-first, so every split below is a view into `values`
+    def __init__(self, values, preprocessor, n_train):
+        self.values = values
+        self.preprocessor = preprocessor
+        self.n_train = n_train
+
+    @property
+    def columns(self):
+        return self.preprocessor.columns
+
+    def _split(self, X, y):
+        n = self.n_train
+        return X[:n], X[n:], y[:n], y[n:]
+
+    def classification_split(self):
+        y = self.values[:, -1].astype(np.int64)
+        return self._split(self.values[:, :-1], y)
+
+    def regression_split(self):
+        return self._split(self.values[:, 1:], self.values[:, 0])
+
+    def context_split(self, target=REG_TARGET):
+        # features known before the trip runs (route, period, weather) -- what a scoring request carries
+        n_context = len(self.preprocessor.context_columns)
+        X = self.values[:, 1:1 + n_context]
+        y = self.values[:, 0] if target == REG_TARGET else self.values[:, -1].astype(np.int64)
+        return self._split(X, y)
+
+
+def build_feature_matrix(df, preprocessor=None, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    if preprocessor is None:
+        with trace_stage('preprocess.fit', df):
+            preprocessor = TransitPreprocessor().fit(df)
+    # imported here so serving, which never builds a matrix, does not pay for sklearn at startup
+    from sklearn.model_selection import train_test_split
+
+    # same row split train_test_split(X, y, test_size=0.2, random_state=42) gave each target before
+    with trace_stage('preprocess.split', df):
+        train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=test_size, random_state=random_state)
+        order = np.concatenate([train_idx, test_idx])
+        ordered = df.iloc[order]
+    values = preprocessor.transform(ordered)
+    return FeatureMatrix(values, preprocessor, len(train_idx))
+
+
+def feature_cache_dir(csv_path, cache_dir=CACHE_DIR, variant=''):
+    # variant tags matrices built from the same CSV with extra columns (e.g. weather features)
+    stem = os.path.splitext(os.path.basename(csv_path))[0] + variant
+    digest = source_digest(csv_path, cache_dir)
+    return os.path.join(cache_dir, f"features-{stem}-{digest}-p{PIPELINE_VERSION}")
+
+
+def save_feature_matrix(features, path):
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, 'matrix.npy'), features.values)
+    features.preprocessor.save(os.path.join(tmp, 'preprocessor.json'))
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'n_train': features.n_train}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def read_feature_matrix(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    values = np.load(os.path.join(path, 'matrix.npy'), mmap_mode='r')
+    preprocessor = TransitPreprocessor.load(os.path.join(path, 'preprocessor.json'))
+    return FeatureMatrix(values, preprocessor, meta['n_train'])
+
+
+def load_feature_matrix(csv_path, load_frame, cache_dir=CACHE_DIR, variant=''):
+    # load_frame is only called on a cache miss
+    if cache_dir is None:
+        return build_feature_matrix(load_frame())
+
+    path = feature_cache_dir(csv_path, cache_dir, variant)
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        print("✅ Reusing cached feature matrix.")
+        with trace_stage('preprocess.cache_read') as span:
+            features = read_feature_matrix(path)
+            span.set(features.values)
+        return features
+
+    features = build_feature_matrix(load_frame())
+    with trace_stage('preprocess.cache_write', features.values):
+        save_feature_matrix(features, path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0] + variant
+    for name in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, name)
+        # features-{stem}-{digest}-p{N}: an exact stem match, so other sources' matrices survive
+        if name.rsplit('-', 2)[0] == f"features-{stem}" and os.path.isdir(stale) and stale != path:
+            shutil.rmtree(stale)
+    return features
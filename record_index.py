@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from streaming_cleaner import list_partition_files, month_partition_dir
+from transit_schema import KEY_PARTS, apply_schema, build_key
+
+INDEX_DIR = '_record_index'
+TOMBSTONE_DIR = 'tombstones'
+
+
+def key_hashes(df):
+    # one uint64 per row for the natural key the `key` column spells out; 64 bits keeps collisions negligible
+    # at tens of millions of rows
+    keys = apply_schema(df[KEY_PARTS].copy())
+    for col in KEY_PARTS:
+        if isinstance(keys[col].dtype, pd.CategoricalDtype):
+            # hash label text, so route 66 read from a CSV and '66' read from Parquet agree
+            keys[col] = keys[col].cat.rename_categories(keys[col].cat.categories.astype(str))
+    return pd.util.hash_pandas_object(keys, index=False, categorize=True).to_numpy(dtype=np.uint64)
+
+
+def _read_key_hashes(path):
+    return key_hashes(pq.read_table(path, columns=KEY_PARTS).to_pandas())
+
+
+def read_tombstones(store_dir):
+    # (tombstone, part file its rows were removed from), both relative to the store, oldest first. A consumer
+    # that already read the part file subtracts the tombstone's rows; one that has not never saw them.
+    path = os.path.join(store_dir, INDEX_DIR, 'files.json')
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [(t['path'], t['source']) for t in json.load(f).get('tombstones', [])]
+
+
+def _write_atomic(table, path):
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+class RecordIndex:
+    # hash -> owning part file for every row in a month-partitioned store; lookups go through a pd.Index
+    # hash table, so membership checks for a batch are one vectorised get_indexer call
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.files = []
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.file_ids = np.empty(0, dtype=np.int32)
+        self.duplicates = 0
+        self.tombstones = []
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = pd.Index(self.hashes)
+        return self._index
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _path(self, file_id):
+        return os.path.join(self.store_dir, self.files[file_id])
+
+    def _add(self, hashes, file_ids):
+        hashes = np.concatenate([self.hashes, hashes])
+        file_ids = np.concatenate([self.file_ids, file_ids]).astype(np.int32)
+        # a key seen twice is a duplicate row in the store; the latest part file owns it
+        dup = pd.Index(hashes).duplicated(keep='last')
+        self.duplicates += int(dup.sum())
+        self.hashes, self.file_ids = hashes[~dup], file_ids[~dup]
+        self._index = None
+
+    def refresh(self):
+        # pick up part files written outside the index (e.g. streaming_cleaner --append)
+        on_disk = {os.path.relpath(f, self.store_dir) for f in list_partition_files(self.store_dir)}
+        if any(f is not None and f not in on_disk for f in self.files):
+            # files were replaced underneath us, start over; tombstones already handed out stay listed
+            tombstones = self.tombstones
+            self.__init__(self.store_dir)
+            self.tombstones = tombstones
+        known = set(self.files)
+        new = sorted(on_disk - known)
+        for rel in new:
+            self.files.append(rel)
+            h = _read_key_hashes(os.path.join(self.store_dir, rel))
+            self._add(h, np.full(len(h), len(self.files) - 1))
+        return len(new)
+
+    def contains(self, df):
+        return self.index.get_indexer(key_hashes(df)) >= 0
+
+    def locate(self, df):
+        pos = self.index.get_indexer(key_hashes(df))
+        found = pos >= 0
+        out = np.full(len(pos), None, dtype=object)
+        out[found] = np.asarray(self.files, dtype=object)[self.file_ids[pos[found]]]
+        return out
+
+    def _schema(self, df):
+        for file_id in range(len(self.files)):
+            if self.files[file_id] is not None:
+                return pq.read_schema(self._path(file_id))
+        return pa.Table.from_pandas(df, preserve_index=False).schema
+
+    def _to_table(self, df, schema):
+        if 'key' in schema.names and 'key' not in df.columns:
+            df = df.assign(key=build_key(df))
+        return pa.Table.from_pandas(df[schema.names], preserve_index=False).cast(schema)
+
+    def _new_part_path(self, month, part_name):
+        part_dir = month_partition_dir(self.store_dir, month)
+        os.makedirs(part_dir, exist_ok=True)
+        # a removed file's name is never reused: consumers remember the files they have read by name
+        retired = {t['source'] for t in self.tombstones}
+        path, n = os.path.join(part_dir, f"{part_name}.parquet"), 1
+        while os.path.exists(path) or os.path.relpath(path, self.store_dir) in retired:
+            path, n = os.path.join(part_dir, f"{part_name}-{n}.parquet"), n + 1
+        return path
+
+    def _remove_rows(self, file_id, keep):
+        # rows only ever leave a part file through a tombstone holding exactly those rows, so incremental
+        # consumers (incremental.py, aggregate_cube.py) can take back what they read from the file before
+        path = self._path(file_id)
+        table = pq.read_table(path)
+        tombstone_dir = os.path.join(self.store_dir, INDEX_DIR, TOMBSTONE_DIR)
+        os.makedirs(tombstone_dir, exist_ok=True)
+        tombstone = os.path.join(tombstone_dir, f"tombstone-{len(self.tombstones):06d}.parquet")
+        _write_atomic(table.filter(pa.array(~keep)), tombstone)
+        self.tombstones.append({'path': os.path.relpath(tombstone, self.store_dir), 'source': self.files[file_id]})
+        if keep.any():
+            _write_atomic(table.filter(pa.array(keep)), path)
+        else:
+            os.remove(path)
+            self.files[file_id] = None
+
+    def upsert(self, df, part_name=None):
+        part_name = part_name or f"part-{pd.Timestamp.now().strftime('%Y%m%d%H%M%S')}-upsert"
+        df = apply_schema(df, keep_redundant=True).reset_index(drop=True)
+        h = key_hashes(df)
+        # within one batch the later row wins, same as across batches
+        last = ~pd.Index(h).duplicated(keep='last')
+        df, h = df.loc[last].reset_index(drop=True), h[last]
+
+        pos = self.index.get_indexer(h)
+        existing = pos >= 0
+        owner = np.full(len(h), -1, dtype=np.int32)
+        owner[existing] = self.file_ids[pos[existing]]
+        schema = self._schema(df)
+
+        # new keys and corrections alike go to fresh part files
+        months = df['day'].dt.strftime('%Y-%m').to_numpy()
+        file_ids = np.empty(len(df), dtype=np.int32)
+        for month in pd.unique(months):
+            in_month = months == month
+            path = self._new_part_path(month, part_name)
+            _write_atomic(self._to_table(df.loc[in_month], schema), path)
+            self.files.append(os.path.relpath(path, self.store_dir))
+            file_ids[in_month] = len(self.files) - 1
+
+        # the older versions of corrected keys leave their part files through tombstones
+        rewritten = np.unique(owner[existing])
+        for file_id in rewritten:
+            stale = pd.Index(h[owner == file_id])
+            self._remove_rows(file_id, stale.get_indexer(_read_key_hashes(self._path(file_id))) < 0)
+
+        # keys in the batch are unique, so ownership moves over without another duplicate pass
+        self.file_ids[pos[existing]] = file_ids[existing]
+        self.hashes = np.concatenate([self.hashes, h[~existing]])
+        self.file_ids = np.concatenate([self.file_ids, file_ids[~existing]])
+        self._index = None
+
+        self.save()
+        return {'inserted': int((~existing).sum()), 'updated': int(existing.sum()),
+                'batch_duplicates': int((~last).sum()), 'files_rewritten': len(rewritten)}
+
+    def deduplicate(self):
+        # drop every row whose key is owned by a later part file (or by a later row of the same file)
+        removed = 0
+        for file_id, rel in enumerate(self.files):
+            if rel is None:
+                continue
+            h = _read_key_hashes(self._path(file_id))
+            keep = self.file_ids[self.index.get_indexer(h)] == file_id
+            keep &= ~pd.Index(h).duplicated(keep='last')
+            if keep.all():
+                continue
+            removed += int((~keep).sum())
+            self._remove_rows(file_id, keep)
+        self.duplicates = 0
+        self.save()
+        return removed
+
+    def save(self):
+        index_dir = os.path.join(self.store_dir, INDEX_DIR)
+        os.makedirs(index_dir, exist_ok=True)
+        for name, values in [('hashes.npy', self.hashes), ('file_ids.npy', self.file_ids)]:
+            tmp = os.path.join(index_dir, f"tmp-{name}")
+            np.save(tmp, values)
+            os.replace(tmp, os.path.join(index_dir, name))
+        tmp = os.path.join(index_dir, 'files.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'files': self.files, 'duplicates': self.duplicates, 'tombstones': self.tombstones}, f)
+        os.replace(tmp, os.path.join(index_dir, 'files.json'))
+
+    @classmethod
+    def open(cls, store_dir):
+        # load the persisted index if there is one, then fold in any part files it has not seen
+        rec = cls(store_dir)
+        index_dir = os.path.join(store_dir, INDEX_DIR)
+        if os.path.exists(os.path.join(index_dir, 'files.json')):
+            with open(os.path.join(index_dir, 'files.json')) as f:
+                meta = json.load(f)
+            rec.files, rec.duplicates = meta['files'], meta['duplicates']
+            rec.tombstones = meta.get('tombstones', [])
+            rec.hashes = np.load(os.path.join(index_dir, 'hashes.npy'))
+            rec.file_ids = np.load(os.path.join(index_dir, 'file_ids.npy'))
+        if rec.refresh():
+            rec.save()
+        return rec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Natural-key record index for a month-partitioned transit store.")
+    parser.add_argument("store_dir")
+    parser.add_argument("--upsert", help="cleaned CSV of new or corrected rows to upsert into the store")
+    parser.add_argument("--dedup", action="store_true", help="remove duplicate rows already in the store")
+    args = parser.parse_args()
+
+    index = RecordIndex.open(args.store_dir)
+    print(f"✅ Indexed {len(index):,} keys across {sum(f is not None for f in index.files)} part files "
+          f"({index.duplicates:,} duplicate rows)")
+    if args.upsert:
+        stats = index.upsert(pd.read_csv(args.upsert))
+        print(f"✅ Upserted: {stats['inserted']:,} new, {stats['updated']:,} corrected, "
+              f"{stats['files_rewritten']} part files rewritten")
+    if args.dedup:
+        print(f"✅ Removed {index.deduplicate():,} duplicate rows")
@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from evaluation import regression_metrics
+from model_store import ServingModels
+from preprocessing import CLASS_TARGET, REG_TARGET, on_time_status
+from record_index import key_hashes
+from streaming_cleaner import list_partition_files
+from transit_schema import table_to_frame
+
+SHARD_DIR = 'shards'
+MIN_SHARD_ROWS = 500
+SHARD_ROUNDS = 60
+# shallow trees: each shard only has to model one route's (or cluster's) context
+SHARD_PARAMS = {'tree_method': 'hist', 'max_depth': 4, 'eta': 0.1, 'seed': 42, 'nthread': 1}
+
+# one copy of the global encoders, models and holdout keys per worker process, however many shards it trains
+_global_models = {}
+
+
+def _holdout_path(model_dir):
+    with open(os.path.join(model_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if 'holdout' not in manifest:
+        raise ValueError(f"'{model_dir}' does not list the rows its models held out; retrain it with model_store.py.")
+    return os.path.join(model_dir, manifest['holdout']['file'])
+
+
+def _load_global(model_dir):
+    if model_dir not in _global_models:
+        _global_models[model_dir] = ServingModels(model_dir), np.load(_holdout_path(model_dir))
+    return _global_models[model_dir]
+
+
+def global_model_digest(model_dir):
+    # every file the global model is made of; shard decisions made against an older global model are redone
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(os.listdir(model_dir)):
+        path = os.path.join(model_dir, name)
+        if os.path.isfile(path):
+            h.update(name.encode())
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+    return h.hexdigest()
+
+
+def load_source(source):
+    if os.path.isdir(source):
+        df = table_to_frame(ds.dataset(list_partition_files(source), format='parquet').to_table())
+    else:
+        from data_cache import CACHE_DIR, load_frame
+        df = load_frame(source, CACHE_DIR)
+    if CLASS_TARGET not in df.columns:
+        df[CLASS_TARGET] = on_time_status(df)
+    return df
+
+
+def route_profiles(df):
+    # per-route punctuality by day type x time period: what the most/least punctual lists in dataEDA.py differ on
+    total = df['early_stops'] + df['late_stops'] + df['on-time_stops']
+    pct = (df['on-time_stops'] / total.where(total > 0)).rename('pct')
+    profile = pct.groupby([df['route_number'].astype(str), df['day_type'].astype(str),
+                           df['time_period'].astype(str)]).mean().unstack([1, 2])
+    return profile.fillna(profile.mean()).fillna(0)
+
+
+def assign_shards(df, clusters=None):
+    # route_number -> shard name; one shard per route, or per k-means cluster of route profiles
+    routes = sorted(df['route_number'].astype(str).unique())
+    if not clusters:
+        return {r: f"route-{re.sub(r'[^A-Za-z0-9_.-]', '_', r)}" for r in routes}
+    from sklearn.cluster import KMeans
+
+    profile = route_profiles(df)
+    labels = KMeans(n_clusters=min(clusters, len(profile)), n_init=10, random_state=42).fit_predict(profile)
+    return {r: f"cluster-{int(c):02d}" for r, c in zip(profile.index, labels)}
+
+
+def fingerprint(df):
+    # order-independent digest of a shard's rows: sorted per-row hashes
+    hashes = np.sort(pd.util.hash_pandas_object(df, index=False).to_numpy())
+    return hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+
+def write_route_layout(df, layout_dir, shard_of):
+    # one Parquet file per shard; a shard whose rows did not change is not rewritten
+    os.makedirs(layout_dir, exist_ok=True)
+    index_path = os.path.join(layout_dir, 'layout.json')
+    previous = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            previous = json.load(f)['shards']
+
+    shard = df['route_number'].astype(str).map(shard_of)
+    layout, changed = {}, []
+    for name, part in df.groupby(shard, sort=True, observed=True):
+        part = part.reset_index(drop=True)
+        digest = fingerprint(part)
+        path = os.path.join(layout_dir, f"shard={name}.parquet")
+        if previous.get(name, {}).get('fingerprint') != digest or not os.path.exists(path):
+            part.to_parquet(path, index=False)
+            changed.append(name)
+        layout[name] = {'fingerprint': digest, 'rows': len(part),
+                        'routes': sorted(r for r, s in shard_of.items() if s == name)}
+    for name in set(previous) - set(layout):
+        stale = os.path.join(layout_dir, f"shard={name}.parquet")
+        if os.path.exists(stale):
+            os.remove(stale)
+    with open(index_path, 'w') as f:
+        json.dump({'shards': layout}, f, indent=2)
+    return layout, changed
+
+
+def train_shard(name, layout_dir, model_dir, min_rows=MIN_SHARD_ROWS, rounds=SHARD_ROUNDS):
+    import xgboost as xgb
+
+    started = time.perf_counter()
+    df = table_to_frame(pq.read_table(os.path.join(layout_dir, f"shard={name}.parquet")))
+    if len(df) < min_rows:
+        return {'shard': name, 'status': 'global', 'reason': f'{len(df)} rows < {min_rows}', 'rows': len(df)}
+    if CLASS_TARGET not in df.columns:
+        df[CLASS_TARGET] = on_time_status(df)
+
+    # shards reuse the global encoders and feature order, so one encode serves every shard at predict time
+    global_models, global_holdout = _load_global(model_dir)
+    X = global_models.encode(df)
+    y = {REG_TARGET: df[REG_TARGET].to_numpy(dtype=np.float32, na_value=0),
+         CLASS_TARGET: df[CLASS_TARGET].to_numpy(dtype=np.float32)}
+    objectives = {REG_TARGET: 'reg:squarederror', CLASS_TARGET: 'binary:logistic'}
+
+    # the decision is made on the shard's rows the global model held out, which the shard fit leaves out too,
+    # so both models are scored out of sample
+    held = np.isin(key_hashes(df), global_holdout)
+    if not held.any() or held.all():
+        return {'shard': name, 'status': 'global', 'reason': 'no rows to compare on outside both fits',
+                'rows': len(df)}
+    regressor = xgb.train(dict(SHARD_PARAMS, objective=objectives[REG_TARGET]),
+                          xgb.DMatrix(X[~held], y[REG_TARGET][~held]), rounds)
+    shard_mae = regression_metrics(y[REG_TARGET][held], regressor.inplace_predict(X[held]))['mae']
+    global_mae = regression_metrics(y[REG_TARGET][held], global_models.predict_matrix(X[held])[REG_TARGET])['mae']
+    record = {'shard': name, 'rows': len(df), 'compared_rows': int(held.sum()),
+              'shard_mae': round(float(shard_mae), 4), 'global_mae': round(float(global_mae), 4)}
+    if shard_mae > global_mae:
+        return {**record, 'status': 'global', 'reason': 'global model scores better on its held-out rows'}
+
+    shard_dir = os.path.join(model_dir, SHARD_DIR, name)
+    os.makedirs(shard_dir, exist_ok=True)
+    for target, objective in objectives.items():
+        booster = xgb.train(dict(SHARD_PARAMS, objective=objective), xgb.DMatrix(X, y[target]), rounds)
+        booster.save_model(os.path.join(shard_dir, f"{target}.ubj"))
+    return {**record, 'status': 'model', 'wall_s': round(time.perf_counter() - started, 3)}
+
+
+def train_shards(source, model_dir, layout_dir, clusters=None, min_rows=MIN_SHARD_ROWS, rounds=SHARD_ROUNDS,
+                 workers=None, force=False):
+    df = load_source(source)
+    shard_of = assign_shards(df, clusters)
+    layout, _ = write_route_layout(df, layout_dir, shard_of)
+    del df
+
+    # fail before any shard is trained if the global model predates holdout keys
+    _holdout_path(model_dir)
+    # a new global model or new shard settings invalidate every shard decision, not just the changed shards
+    settings = {'min_rows': min_rows, 'rounds': rounds, 'params': SHARD_PARAMS,
+                'global_model': global_model_digest(model_dir)}
+    table_path = os.path.join(model_dir, SHARD_DIR, 'shards.json')
+    previous = {}
+    if os.path.exists(table_path):
+        with open(table_path) as f:
+            previous = json.load(f)
+        if previous.get('clusters') != clusters or previous.get('settings') != settings:
+            previous = {}
+    done = previous.get('shards', {})
+    # otherwise a shard is retrained only when its rows changed since the model was built
+    todo = [n for n, meta in layout.items()
+            if force or done.get(n, {}).get('fingerprint') != meta['fingerprint']]
+    print(f"🧩 {len(layout)} shards, {len(todo)} to (re)train, {len(layout) - len(todo)} unchanged")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    shards = {n: done[n] for n in layout if n not in todo}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(train_shard, n, layout_dir, model_dir, min_rows, rounds): n for n in todo}
+        for future in as_completed(futures):
+            result = future.result()
+            result['fingerprint'] = layout[result['shard']]['fingerprint']
+            shards[result['shard']] = result
+            if result['status'] == 'global':
+                # an older model for this shard must not keep serving
+                for target in (REG_TARGET, CLASS_TARGET):
+                    stale = os.path.join(model_dir, SHARD_DIR, result['shard'], f"{target}.ubj")
+                    if os.path.exists(stale):
+                        os.remove(stale)
+
+    table = {'clusters': clusters, 'settings': settings, 'routes': shard_of, 'shards': shards}
+    os.makedirs(os.path.dirname(table_path), exist_ok=True)
+    with open(table_path, 'w') as f:
+        json.dump(table, f, indent=2)
+    n_models = sum(s['status'] == 'model' for s in shards.values())
+    print(f"✅ {n_models} shard models, {len(shards) - n_models} shards served by the global model")
+    return table
+
+
+class ShardedModels:
+    # same interface as ServingModels; rows are routed to their shard through an in-memory route table
+    def __init__(self, model_dir):
+        import xgboost as xgb
+
+        self.global_models = ServingModels(model_dir)
+        self.features = self.global_models.features
+        with open(os.path.join(model_dir, SHARD_DIR, 'shards.json')) as f:
+            table = json.load(f)
+        self.boosters = []
+        shard_index = {}
+        for name, meta in sorted(table['shards'].items()):
+            if meta['status'] == 'model':
+                shard_index[name] = len(self.boosters)
+                path = os.path.join(model_dir, SHARD_DIR, name)
+                self.boosters.append({t: xgb.Booster(model_file=os.path.join(path, f"{t}.ubj"))
+                                      for t in (REG_TARGET, CLASS_TARGET)})
+        self.route_table = {r: shard_index[s] for r, s in table['routes'].items() if s in shard_index}
+
+    def encode(self, df):
+        return self.global_models.encode(df)
+
+    def shard_ids(self, df):
+        if 'route_number' not in df.columns:
+            return np.full(len(df), -1)
+        return df['route_number'].astype(str).map(self.route_table).fillna(-1).to_numpy(dtype=np.int64)
+
+    def predict(self, df):
+        X = self.encode(df)
+        ids = self.shard_ids(df)
+        out = {REG_TARGET: np.empty(len(df), dtype=np.float32),
+               'on_time_probability': np.empty(len(df), dtype=np.float32)}
+        fallback = ids < 0
+        if fallback.any():
+            preds = self.global_models.predict_matrix(X[fallback])
+            out[REG_TARGET][fallback] = preds[REG_TARGET]
+            out['on_time_probability'][fallback] = preds['on_time_probability']
+        for shard in np.unique(ids[~fallback]):
+            rows = ids == shard
+            boosters = self.boosters[shard]
+            out[REG_TARGET][rows] = boosters[REG_TARGET].inplace_predict(X[rows])
+            out['on_time_probability'][rows] = boosters[CLASS_TARGET].inplace_predict(X[rows])
+        return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-route (or per-cluster) shard models next to a global model.")
+    parser.add_argument("source", help="merged CSV or month-partitioned store")
+    parser.add_argument("--models", default="models", help="global model directory from model_store.py (xgb)")
+    parser.add_argument("--layout-dir", default="route_shards_data")
+    parser.add_argument("--clusters", type=int, default=None, help="shard by k-means route clusters instead of routes")
+    parser.add_argument("--min-rows", type=int, default=MIN_SHARD_ROWS)
+    parser.add_argument("--rounds", type=int, default=SHARD_ROUNDS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="retrain every shard")
+    args = parser.parse_args()
+
+    table = train_shards(args.source, args.models, args.layout_dir, args.clusters, args.min_rows, args.rounds,
+                         args.workers, args.force)
+    rows = pd.DataFrame(table['shards'].values()).set_index('shard')
+    print(rows.drop(columns=['fingerprint']).sort_values('rows', ascending=False).head(20).to_string())
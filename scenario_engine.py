@@ -0,0 +1,252 @@
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_store import ServingModels
+from preprocessing import REG_TARGET
+
+CHUNK_ROWS = 250_000
+ROUTE_COLS = ['route_number', 'route_name', 'route_destination']
+# share of combinations whose on-time probability falls below this counts as "at risk"
+AT_RISK_BELOW = 0.5
+
+
+def expand_weather(record, features):
+    # a scenario's windgust/snow are the interval's max gust and total snowfall (what the merged data
+    # carries); models trained with weather_features.py also see them as steady conditions in every window.
+    # Also returns the keys that set a derived model feature, so they are not reported as ignored.
+    record, consumed = dict(record), set()
+    if 'windgust' in record and record['windgust'] is not None:
+        from weather_features import GUST_THRESHOLD, WINDGUST_BINS, bin_codes
+        gust = float(record['windgust'])
+        derived = {col: gust for col in ('windgust_lag_1h', 'windgust_max_3h', 'windgust_max_24h',
+                                         'windgust_max_prev_24h')}
+        derived['gust_over_threshold'] = float(gust > GUST_THRESHOLD)
+        derived['windgust_level'] = int(bin_codes([gust], WINDGUST_BINS)[0])
+        derived = {k: v for k, v in derived.items() if k in features}
+        consumed |= {'windgust'} if derived else set()
+        record = {**derived, **record}
+    if 'snow' in record and record['snow'] is not None:
+        from weather_features import SNOW_BINS, bin_codes
+        snow = float(record['snow'])
+        derived = {col: snow for col in ('snow_6h', 'snow_24h', 'snow_72h')}
+        derived['snow_level'] = int(bin_codes([snow], SNOW_BINS)[0])
+        derived = {k: v for k, v in derived.items() if k in features}
+        consumed |= {'snow'} if derived else set()
+        record = {**derived, **record}
+    if 'temp' in record and record['temp'] is not None and 'below_freezing' in features:
+        record.setdefault('below_freezing', float(record['temp'] <= 0))
+        consumed.add('temp')
+    return record, consumed
+
+
+def _label(record, column):
+    if 'name' in record:
+        return str(record['name'])
+    if column in record:
+        return str(record[column])
+    return ', '.join(f"{k}={v}" for k, v in record.items())
+
+
+def route_records(routes):
+    return [{**r, 'name': f"{r['route_number']} {r.get('route_destination', '')}".strip()} for r in routes]
+
+
+def axis_frame(name, values, models):
+    # "all" -> every label the encoders know; scalars -> {column: value}; dicts are used as they are.
+    # The 'route' axis stands for route_number unless its records carry more route columns.
+    column = 'route_number' if name == 'route' else name
+    if values == 'all' and name == 'route':
+        # the route / name / destination combinations the models were trained on, not every route number alone
+        if 'routes' not in models.manifest:
+            raise ValueError("These models do not list their routes; pass --routes-from or retrain them.")
+        values = route_records(models.manifest['routes'])
+    elif values == 'all':
+        if column not in models.preprocessor.categories:
+            raise ValueError(f"Axis '{name}' is not a categorical column; list its values explicitly.")
+        values = [v for v in models.preprocessor.categories[column] if v != 'nan']
+    records = [v if isinstance(v, dict) else {column: v} for v in values]
+    expanded = [expand_weather(r, models.features) for r in records]
+    records = [r for r, _ in expanded]
+    frame = pd.DataFrame.from_records(records)
+    frame['label'] = [_label(r, column) for r in records]
+    return frame, set().union(*(c for _, c in expanded))
+
+
+def route_axis(csv_path):
+    # the route / name / destination combinations that actually run, instead of their cross product
+    from data_cache import CACHE_DIR, load_frame
+    routes = load_frame(csv_path, CACHE_DIR, columns=ROUTE_COLS).astype(str).drop_duplicates()
+    return route_records(routes.sort_values(ROUTE_COLS).to_dict('records'))
+
+
+class ScenarioGrid:
+    # a lazily expanded cartesian product of axes. Each axis is encoded once (a handful of rows), and a
+    # chunk of flat grid positions is turned into matrix rows by unravel_index + fancy indexing into
+    # those small blocks; the full grid is never materialised.
+    def __init__(self, axes, models, defaults=None):
+        self.models = models
+        self.names = list(axes)
+        expanded = [axis_frame(name, values, models) for name, values in axes.items()]
+        self.frames = [frame for frame, _ in expanded]
+        consumed = set().union(*(c for _, c in expanded))
+        self.shape = tuple(len(f) for f in self.frames)
+        self.size = math.prod(self.shape)
+        features = models.features
+
+        # columns no axis sets: the spec's defaults, else the training medians / modes saved with the models
+        # (0 would mean the first category, or 0 °C and zero visibility)
+        defaults = defaults or {}
+        if 'defaults' not in models.manifest:
+            set_by_axes = {c for frame in self.frames for c in frame.columns}
+            unset = [c for c in features if c not in set_by_axes and c not in defaults]
+            if unset:
+                raise ValueError(f"No defaults for {unset}; set them in the spec or retrain the models.")
+        self.base = models.encode(pd.DataFrame([{**models.manifest.get('defaults', {}), **defaults}]))[0]
+        self.blocks, owner, ignored = [], {}, set()
+        for name, frame in zip(self.names, self.frames):
+            cols = [j for j, c in enumerate(features) if c in frame.columns]
+            for j in cols:
+                if j in owner:
+                    raise ValueError(f"Column '{features[j]}' is set by both '{owner[j]}' and '{name}'.")
+                owner[j] = name
+            ignored |= set(frame.columns) - set(features) - {'label', 'name'}
+            encoded = models.preprocessor.transform(frame, columns=[features[j] for j in cols])
+            self.blocks.append((np.asarray(cols, dtype=np.intp), encoded))
+        # e.g. windgust for a model trained without weather features: say so rather than silently ignore it
+        self.ignored = sorted(ignored - consumed)
+
+    def positions(self, start, stop):
+        return np.unravel_index(np.arange(start, stop, dtype=np.int64), self.shape)
+
+    def matrix(self, index):
+        X = np.empty((len(index[0]), len(self.base)), dtype=np.float32)
+        X[:] = self.base
+        for axis_index, (cols, encoded) in zip(index, self.blocks):
+            if len(cols):
+                X[:, cols] = encoded[axis_index]
+        return X
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        for start in range(0, self.size, chunk_rows):
+            index = self.positions(start, min(start + chunk_rows, self.size))
+            yield index, self.matrix(index)
+
+
+class GroupAggregator:
+    # running sums per output group, accumulated with bincount: memory is one array per statistic per group,
+    # however large the grid
+    def __init__(self, grid, group_by):
+        unknown = set(group_by) - set(grid.names)
+        if unknown:
+            raise ValueError(f"Unknown axes in group_by: {sorted(unknown)}; axes are {grid.names}")
+        self.grid = grid
+        self.dims = [grid.names.index(g) for g in group_by]
+        self.shape = tuple(grid.shape[d] for d in self.dims)
+        self.n_groups = math.prod(self.shape)
+        self.count = np.zeros(self.n_groups)
+        self.sums = {}
+        self.at_risk = np.zeros(self.n_groups)
+
+    def add(self, index, preds):
+        if self.dims:
+            group = np.ravel_multi_index([index[d] for d in self.dims], self.shape)
+        else:
+            group = np.zeros(len(index[0]), dtype=np.int64)
+        self.count += np.bincount(group, minlength=self.n_groups)
+        for name, values in preds.items():
+            if name not in self.sums:
+                self.sums[name] = np.zeros(self.n_groups)
+            self.sums[name] += np.bincount(group, weights=values, minlength=self.n_groups)
+        if 'on_time_probability' in preds:
+            risky = (preds['on_time_probability'] < AT_RISK_BELOW).astype(np.float64)
+            self.at_risk += np.bincount(group, weights=risky, minlength=self.n_groups)
+
+    def result(self):
+        labels = np.unravel_index(np.arange(self.n_groups), self.shape)
+        out = pd.DataFrame({self.grid.names[d]: self.grid.frames[d]['label'].to_numpy()[i]
+                            for d, i in zip(self.dims, labels)})
+        count = np.maximum(self.count, 1)
+        out['combinations'] = self.count.astype(np.int64)
+        for name, total in self.sums.items():
+            out[f"mean_{name}"] = total / count
+        if 'on_time_probability' in self.sums:
+            out['share_at_risk'] = self.at_risk / count
+        return out
+
+
+def run_scenarios(model_dir, axes, group_by=(), defaults=None, chunk_rows=CHUNK_ROWS, progress_every=0.1):
+    models = ServingModels(model_dir)
+    grid = ScenarioGrid(axes, models, defaults)
+    if grid.ignored:
+        print(f"⚠️ Not model features, ignored: {', '.join(grid.ignored)}")
+    aggregator = GroupAggregator(grid, list(group_by))
+    shape = ' x '.join(f"{n}={s}" for n, s in zip(grid.names, grid.shape))
+    print(f"🧪 {grid.size:,} combinations ({shape}) in chunks of {chunk_rows:,}")
+
+    started = time.perf_counter()
+    done, next_report = 0, progress_every
+    for index, X in grid.chunks(chunk_rows):
+        aggregator.add(index, models.predict_matrix(X))
+        done += len(X)
+        if progress_every and done / grid.size >= next_report and done < grid.size:
+            elapsed = time.perf_counter() - started
+            eta = elapsed / done * (grid.size - done)
+            print(f"⏱️ {done / grid.size:6.1%}  {done:,} scored  {done / elapsed:,.0f} rows/s  ETA {eta:.0f}s")
+            next_report = math.floor(done / grid.size / progress_every) * progress_every + progress_every
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {grid.size:,} combinations in {elapsed:.1f}s ({grid.size / max(elapsed, 1e-9):,.0f} rows/s)")
+    return aggregator.result()
+
+
+def _weather_axis(args):
+    # --windgust 30 40 --snow 0 5: one scenario per combination of the listed values
+    listed = {k: v for k, v in (('windgust', args.windgust), ('snow', args.snow), ('temp', args.temp)) if v}
+    if not listed:
+        return None
+    names, values = zip(*listed.items())
+    grid = np.array(np.meshgrid(*values, indexing='ij')).reshape(len(names), -1).T
+    return [{**dict(zip(names, map(float, row))), 'name': ', '.join(f"{n}={v:g}" for n, v in zip(names, row))}
+            for row in grid]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a route x period x day type x weather grid with saved models.")
+    parser.add_argument("model_dir")
+    parser.add_argument("--spec", help='JSON: {"axes": {name: "all" | [values or records]}, "defaults": {...}, '
+                                       '"group_by": [axis, ...]}')
+    parser.add_argument("--routes-from", help="take the route axis from the routes in this merged CSV")
+    parser.add_argument("--windgust", type=float, nargs="*")
+    parser.add_argument("--snow", type=float, nargs="*")
+    parser.add_argument("--temp", type=float, nargs="*")
+    parser.add_argument("--group-by", nargs="*", help="axes to aggregate by (default: from the spec, else route)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", help="write the aggregated table to this CSV")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    spec = {'axes': {}}
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+    axes = dict(spec['axes'])
+    if args.routes_from:
+        axes['route'] = route_axis(args.routes_from)
+    for name in ('route', 'time_period', 'day_type'):
+        axes.setdefault(name, 'all')
+    weather = _weather_axis(args)
+    if weather:
+        axes['weather'] = weather
+    group_by = args.group_by if args.group_by is not None else spec.get('group_by', ['route'])
+
+    table = run_scenarios(args.model_dir, axes, group_by, spec.get('defaults'), args.chunk_rows)
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"✅ Aggregates saved to '{args.out}'")
+    sort_col = f"mean_{REG_TARGET}" if f"mean_{REG_TARGET}" in table.columns else table.columns[-1]
+    print(f"\n📊 Top {args.top} by {sort_col}")
+    print(table.sort_values(sort_col, ascending=False).head(args.top).round(4).to_string(index=False))
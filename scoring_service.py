@@ -0,0 +1,207 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from model_store import ServingModels
+
+
+class LatencyStats:
+    def __init__(self, window=20_000):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = self.rows = self.batches = self.errors = 0
+
+    def record_request(self, seconds, rows):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self, rows):
+        with self.lock:
+            self.batches += 1
+            self.batch_sizes.append(rows)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            lat = np.array(self.latencies) * 1000
+            sizes = np.array(self.batch_sizes)
+            uptime = time.perf_counter() - self.started
+            return {
+                'uptime_s': round(uptime, 2),
+                'requests': self.requests,
+                'rows': self.rows,
+                'batches': self.batches,
+                'errors': self.errors,
+                'requests_per_s': round(self.requests / uptime, 2) if uptime else 0.0,
+                'rows_per_s': round(self.rows / uptime, 2) if uptime else 0.0,
+                'latency_p50_ms': round(float(np.percentile(lat, 50)), 3) if len(lat) else None,
+                'latency_p99_ms': round(float(np.percentile(lat, 99)), 3) if len(lat) else None,
+                'mean_batch_rows': round(float(sizes.mean()), 2) if len(sizes) else None,
+            }
+
+
+class _Pending:
+    def __init__(self, records):
+        self.records = records
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    # concurrent requests queue up here; one worker drains them into a single vectorized predict
+    def __init__(self, models, stats, max_batch_rows=1024, max_wait_ms=2.0):
+        self.models = models
+        self.stats = stats
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, records, timeout=10.0):
+        # checked before queueing: a malformed request is rejected on its own, never inside someone else's batch
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise TypeError("records must be a JSON object or a list of objects")
+        pending = _Pending(records)
+        self.queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError("prediction timed out")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        rows = len(batch[0].records)
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item.records)
+        return batch, rows
+
+    def _predict(self, batch, rows):
+        frame = pd.DataFrame([r for item in batch for r in item.records])
+        preds = self.models.predict(frame)
+        self.stats.record_batch(rows)
+        start = 0
+        for item in batch:
+            end = start + len(item.records)
+            item.result = {k: v[start:end].tolist() for k, v in preds.items()}
+            start = end
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            try:
+                self._predict(batch, rows)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    # one malformed request must not fail the others it was coalesced with: score them one by one
+                    for item in batch:
+                        try:
+                            self._predict([item], len(item.records))
+                        except Exception as item_error:
+                            item.error = item_error
+            for item in batch:
+                item.done.set()
+
+
+def make_handler(batcher, stats):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send(200, stats.snapshot())
+            elif self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send(404, {'error': 'not found'})
+                return
+            start = time.perf_counter()
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                records = payload['records'] if isinstance(payload, dict) and 'records' in payload else payload
+                if isinstance(records, dict):
+                    records = [records]
+                result = batcher.submit(records)
+            except (ValueError, KeyError, TypeError) as e:
+                stats.record_error()
+                self._send(400, {'error': str(e)})
+                return
+            except Exception as e:
+                stats.record_error()
+                self._send(500, {'error': str(e)})
+                return
+            stats.record_request(time.perf_counter() - start, len(records))
+            self._send(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringHandler
+
+
+def serve(model_dir, host='127.0.0.1', port=8080, max_batch_rows=1024, max_wait_ms=2.0, sharded=False):
+    if sharded:
+        from route_shards import ShardedModels
+        models = ShardedModels(model_dir)
+    else:
+        models = ServingModels(model_dir)
+    stats = LatencyStats()
+    batcher = MicroBatcher(models, stats, max_batch_rows, max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, stats))
+    server.daemon_threads = True
+    print(f"🚏 Scoring service on http://{host}:{server.server_address[1]} (models: {model_dir})")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve delay predictions from persisted models.")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-rows", type=int, default=1024)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--sharded", action="store_true", help="route rows to per-route shard models (route_shards.py)")
+    args = parser.parse_args()
+
+    server = serve(args.models, args.host, args.port, args.max_batch_rows, args.max_wait_ms, args.sharded)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,209 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from instrumentation import trace_stage
+from preprocessing import (CLASS_TARGET, DROP_COLS, RANDOM_STATE, REG_TARGET, STOP_FEATURES, TEST_SIZE, _as_labels,
+                           on_time_status)
+
+ONE_HOT_COLS = ['route_number', 'route_destination', 'day_type', 'time_period', 'day_of_week']
+# high-cardinality interactions a linear model cannot learn from the separate one-hot columns
+CROSSES = [('route_number', 'route_destination', 'time_period')]
+XGB_PARAMS = {'tree_method': 'hist', 'random_state': 42}
+
+
+def _with_day_of_week(df, columns):
+    if 'day_of_week' in columns and 'day_of_week' not in df.columns and 'day' in df.columns:
+        df = df.assign(day_of_week=pd.to_datetime(df['day']).dt.day_name())
+    return df
+
+
+class SparseFeatureEncoder:
+    # CSR layout per row: [dense columns | one-hot blocks | cross blocks]. Every row stores its dense values
+    # (explicit zeros included, so XGBoost reads 0 and not "missing") plus one entry per one-hot/cross block;
+    # labels unseen at fit time get no entry, i.e. an all-zero block.
+    def __init__(self, one_hot=None, crosses=None, dense=None, drop_first=False, scale_dense=True):
+        self.one_hot = list(ONE_HOT_COLS if one_hot is None else one_hot)
+        self.crosses = [tuple(c) for c in (CROSSES if crosses is None else crosses)]
+        self.dense = dense
+        self.drop_first = drop_first
+        self.scale_dense = scale_dense
+        self.categories = {}
+        self.cross_keys = {}
+        self.center = self.scale = None
+
+    def _codes(self, df, col):
+        codes, labels = _as_labels(df[col])
+        lookup = pd.Index(self.categories[col]).get_indexer(labels)
+        return lookup[codes] if len(codes) else np.empty(0, dtype=np.int64)
+
+    def _cross_key(self, df, cross):
+        # mixed-radix combination of the per-column codes; -1 if any part is unseen
+        key = np.zeros(len(df), dtype=np.int64)
+        unseen = np.zeros(len(df), dtype=bool)
+        for col in cross:
+            codes = self._codes(df, col)
+            unseen |= codes < 0
+            key = key * len(self.categories[col]) + codes
+        key[unseen] = -1
+        return key
+
+    def fit(self, df):
+        cross_cols = {c for cross in self.crosses for c in cross}
+        df = _with_day_of_week(df, self.one_hot)
+        for col in dict.fromkeys(self.one_hot + sorted(cross_cols)):
+            _, labels = _as_labels(df[col])
+            self.categories[col] = sorted(set(labels))
+        for cross in self.crosses:
+            key = self._cross_key(df, cross)
+            self.cross_keys[cross] = np.unique(key[key >= 0])
+        if self.dense is None:
+            # numeric context columns, the same ones TransitPreprocessor keeps (weather, mostly)
+            skip = set(DROP_COLS) | set(STOP_FEATURES) | {REG_TARGET, CLASS_TARGET} | set(self.one_hot) | cross_cols
+            self.dense = [c for c in df.columns if c not in skip and pd.api.types.is_numeric_dtype(df[c])]
+        values = self._dense_values(df)
+        if self.scale_dense and len(values):
+            self.center = values.mean(axis=0)
+            self.scale = np.where(values.std(axis=0) > 0, values.std(axis=0), 1).astype(np.float32)
+        return self
+
+    def _dense_values(self, df):
+        out = np.zeros((len(df), len(self.dense)), dtype=np.float32)
+        for j, col in enumerate(self.dense):
+            if col in df.columns:
+                out[:, j] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+        return np.nan_to_num(out, copy=False, nan=0.0)
+
+    @property
+    def block_sizes(self):
+        first = 1 if self.drop_first else 0
+        return ([len(self.categories[c]) - first for c in self.one_hot]
+                + [len(self.cross_keys[c]) for c in self.crosses])
+
+    @property
+    def feature_names(self):
+        first = 1 if self.drop_first else 0
+        names = list(self.dense)
+        for col in self.one_hot:
+            names += [f"{col}={label}" for label in self.categories[col][first:]]
+        for cross in self.crosses:
+            radices = [len(self.categories[c]) for c in cross]
+            for key in self.cross_keys[cross]:
+                parts = np.unravel_index(key, radices)
+                names.append('&'.join(f"{c}={self.categories[c][p]}" for c, p in zip(cross, parts)))
+        return names
+
+    def transform(self, df):
+        df = _with_day_of_week(df, self.one_hot)
+        n = len(df)
+        dense = self._dense_values(df)
+        if self.center is not None:
+            dense = (dense - self.center) / self.scale
+
+        # one column index per block per row; blocks are laid out left to right, so each row's indices are sorted
+        first = 1 if self.drop_first else 0
+        blocks, offset = [], len(self.dense)
+        for col, size in zip(self.one_hot, self.block_sizes):
+            codes = self._codes(df, col) - first
+            blocks.append(np.where(codes >= 0, codes + offset, -1))
+            offset += size
+        for cross in self.crosses:
+            pos = pd.Index(self.cross_keys[cross]).get_indexer(self._cross_key(df, cross))
+            blocks.append(np.where(pos >= 0, pos + offset, -1))
+            offset += len(self.cross_keys[cross])
+
+        indices = np.hstack([np.broadcast_to(np.arange(len(self.dense)), (n, len(self.dense)))]
+                            + [b.reshape(-1, 1) for b in blocks]).astype(np.int32)
+        data = np.hstack([dense, np.ones((n, len(blocks)), dtype=np.float32)])
+        present = indices >= 0
+        indptr = np.concatenate([[0], np.cumsum(present.sum(axis=1))]).astype(np.int64)
+        return sp.csr_matrix((data[present], indices[present], indptr), shape=(n, offset))
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+
+def matrix_mb(X):
+    if sp.issparse(X):
+        return (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 2**20
+    return X.nbytes / 2**20
+
+
+def split_rows(n, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    # same row split build_feature_matrix uses
+    from sklearn.model_selection import train_test_split
+    return train_test_split(np.arange(n), test_size=test_size, random_state=random_state)
+
+
+def fit_models(X_train, X_test, y_train, y_test, family, target):
+    # both families take the CSR matrix as is: sklearn's linear solvers and XGBoost's DMatrix are sparse-native
+    from evaluation import classification_metrics, regression_metrics
+
+    started = time.perf_counter()
+    with trace_stage(f'sparse.{family}.{target}.fit', X_train):
+        if family == 'linear':
+            from sklearn.linear_model import LinearRegression, LogisticRegression
+            model = LinearRegression() if target == REG_TARGET else LogisticRegression(max_iter=1000)
+        else:
+            from xgboost import XGBClassifier, XGBRegressor
+            model = XGBRegressor(**XGB_PARAMS) if target == REG_TARGET else XGBClassifier(**XGB_PARAMS)
+        model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - started
+    preds = model.predict(X_test)
+    metrics = regression_metrics(y_test, preds) if target == REG_TARGET else classification_metrics(y_test, preds)
+    return model, {'fit_s': round(fit_s, 3), **metrics}
+
+
+def compare_dense_sparse(df, families=('linear', 'xgb'), targets=(REG_TARGET, CLASS_TARGET)):
+    # sparse CSR vs the same columns densified (what get_dummies builds) vs the label-encoded integer matrix
+    from preprocessing import build_feature_matrix
+
+    if CLASS_TARGET not in df.columns:
+        df = df.assign(**{CLASS_TARGET: on_time_status(df)})
+    train_idx, test_idx = split_rows(len(df))
+    encoder = SparseFeatureEncoder().fit(df.iloc[train_idx])
+    started = time.perf_counter()
+    X_sparse = encoder.transform(df)
+    build_sparse_s = time.perf_counter() - started
+    started = time.perf_counter()
+    X_dense = X_sparse.toarray()
+    build_dense_s = build_sparse_s + time.perf_counter() - started
+    labels = build_feature_matrix(df)
+
+    rows = []
+    for target in targets:
+        # missing targets become 0, as preprocess_all's fillna(0) does
+        y = df[target].to_numpy(dtype=np.float32 if target == REG_TARGET else np.int64, na_value=0)
+        y_train, y_test = y[train_idx], y[test_idx]
+        inputs = {
+            'sparse_onehot': (X_sparse[train_idx], X_sparse[test_idx], build_sparse_s),
+            'dense_onehot': (X_dense[train_idx], X_dense[test_idx], build_dense_s),
+        }
+        Xl_train, Xl_test, yl_train, yl_test = labels.context_split(target)
+        for family in families:
+            for path, (X_train, X_test, build_s) in inputs.items():
+                _, metrics = fit_models(X_train, X_test, y_train, y_test, family, target)
+                rows.append({'target': target, 'family': family, 'path': path, 'columns': X_train.shape[1],
+                             'matrix_mb': round(matrix_mb(X_train) + matrix_mb(X_test), 3),
+                             'build_s': round(build_s, 3), **metrics})
+            _, metrics = fit_models(Xl_train, Xl_test, yl_train, yl_test, family, target)
+            rows.append({'target': target, 'family': family, 'path': 'label_encoded', 'columns': Xl_train.shape[1],
+                         'matrix_mb': round(matrix_mb(Xl_train) + matrix_mb(Xl_test), 3), **metrics})
+    return pd.DataFrame(rows).set_index(['target', 'family', 'path'])
+
+
+if __name__ == "__main__":
+    from data_cache import CACHE_DIR, load_frame
+
+    parser = argparse.ArgumentParser(description="Sparse one-hot + cross features vs the dense paths.")
+    parser.add_argument("csv_path", nargs="?", default="merged_transit_weather.csv")
+    parser.add_argument("--families", nargs="+", choices=('linear', 'xgb'), default=['linear', 'xgb'])
+    args = parser.parse_args()
+
+    df = load_frame(args.csv_path, CACHE_DIR)
+    table = compare_dense_sparse(df, args.families)
+    print("\n📊 Sparse vs dense feature matrices (fit on the same 80/20 split)")
+    print(table.to_string())
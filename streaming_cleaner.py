@@ -0,0 +1,168 @@
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from transit_schema import table_to_frame
+
+RAW_DAY_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+START_DATE = "2024-10-01"
+END_DATE = "2025-03-31"
+CHUNK_SIZE = 500_000
+
+STOP_COLS = ['early_stops', 'late_stops', 'on-time_stops']
+CLEANED_COLS = ['route_number', 'route_name', 'route_destination', 'day_type', 'day', 'time_period'] + STOP_COLS + ['key']
+
+# fixed output schema so every part file in every month partition lines up
+CLEANED_SCHEMA = pa.schema(
+    [(c, pa.string()) for c in ['route_number', 'route_name', 'route_destination', 'day_type']]
+    + [('day', pa.timestamp('ns')), ('time_period', pa.string())]
+    + [(c, pa.float32()) for c in STOP_COLS]
+    + [('key', pa.string())]
+)
+
+
+def standardize_column(name):
+    return name.strip().lower().replace(' ', '_')
+
+
+def parse_days(values, fmt=RAW_DAY_FORMAT):
+    # a chunk holds only a handful of distinct day strings, so parse each once
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques), format=fmt, errors='coerce').values.astype('datetime64[ns]')
+    # code -1 (missing) lands on the trailing NaT
+    parsed = np.append(parsed, np.datetime64('NaT', 'ns'))
+    return pd.Series(parsed[codes], index=values.index)
+
+
+def _raw_read_options(raw_path):
+    header = pd.read_csv(raw_path, nrows=0).columns
+    rename = {c: standardize_column(c) for c in header if standardize_column(c) in CLEANED_COLS}
+    missing = set(CLEANED_COLS) - set(rename.values()) - {'key'}
+    if missing:
+        raise ValueError(f"Raw file is missing columns: {sorted(missing)}")
+
+    # stop counts are read as text too: one stray non-numeric value must not abort the whole read_csv
+    dtype = {raw: str for raw in rename}
+    return rename, dtype
+
+
+def clean_chunk(chunk, start_date=START_DATE, end_date=END_DATE, day_format=RAW_DAY_FORMAT):
+    chunk['day'] = parse_days(chunk['day'], day_format)
+
+    # drop everything outside the window before doing any other work on the rows
+    in_window = (chunk['day'] >= start_date) & (chunk['day'] <= end_date)
+    chunk = chunk.loc[in_window]
+    chunk = chunk.dropna(subset=['day', 'route_number', 'route_destination'])
+    for col in STOP_COLS:
+        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float32')
+
+    if 'key' not in chunk.columns:
+        chunk['key'] = None
+    return chunk[CLEANED_COLS]
+
+
+def month_partition_dir(out_dir, month):
+    return os.path.join(out_dir, f"month={month}")
+
+
+def write_month_partitions(chunk, out_dir, part_name):
+    written = {}
+    months = chunk['day'].dt.strftime('%Y-%m')
+    for month, part in chunk.groupby(months, sort=False):
+        part_dir = month_partition_dir(out_dir, month)
+        os.makedirs(part_dir, exist_ok=True)
+        table = pa.Table.from_pandas(part, schema=CLEANED_SCHEMA, preserve_index=False)
+        pq.write_table(table, os.path.join(part_dir, f"{part_name}.parquet"))
+        written[month] = len(part)
+    return written
+
+
+def clean_transit_csv(raw_path, out_dir, start_date=START_DATE, end_date=END_DATE,
+                      chunksize=CHUNK_SIZE, overwrite=True, upsert=False):
+    rename, dtype = _raw_read_options(raw_path)
+    if upsert:
+        # overlapping exports: rows whose natural key is already stored replace it instead of duplicating it
+        from record_index import RecordIndex
+        index = RecordIndex.open(out_dir)
+        overwrite = False
+
+    if overwrite and os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            if name.startswith('month='):
+                shutil.rmtree(os.path.join(out_dir, name))
+    os.makedirs(out_dir, exist_ok=True)
+
+    # part files are tagged per run so --append never clobbers an earlier run's parts
+    run_id = pd.Timestamp.now().strftime('%Y%m%d%H%M%S')
+    stats = {'rows_read': 0, 'rows_kept': 0, 'months': {}}
+    reader = pd.read_csv(raw_path, usecols=list(rename), dtype=dtype, chunksize=chunksize)
+    for i, chunk in enumerate(reader):
+        stats['rows_read'] += len(chunk)
+        chunk = clean_chunk(chunk.rename(columns=rename), start_date, end_date)
+        if chunk.empty:
+            continue
+        if upsert:
+            result = index.upsert(chunk, f"part-{run_id}-{i:05d}")
+            stats['inserted'] = stats.get('inserted', 0) + result['inserted']
+            stats['updated'] = stats.get('updated', 0) + result['updated']
+            written = chunk['day'].dt.strftime('%Y-%m').value_counts().to_dict()
+        else:
+            written = write_month_partitions(chunk, out_dir, f"part-{run_id}-{i:05d}")
+        for month, n in written.items():
+            stats['months'][month] = stats['months'].get(month, 0) + n
+            stats['rows_kept'] += n
+        print(f"🧹 Chunk {i}: {stats['rows_read']:,} rows read, {stats['rows_kept']:,} kept")
+
+    print(f"✅ Cleaned data written to '{out_dir}' ({len(stats['months'])} month partitions)")
+    return stats
+
+
+def list_month_partitions(out_dir):
+    if not os.path.isdir(out_dir):
+        return []
+    return sorted(name.split('=', 1)[1] for name in os.listdir(out_dir) if name.startswith('month='))
+
+
+def list_partition_files(out_dir, months=None):
+    available = list_month_partitions(out_dir)
+    wanted = available if months is None else [m for m in available if m in set(months)]
+    files = []
+    for month in wanted:
+        part_dir = month_partition_dir(out_dir, month)
+        files += [os.path.join(part_dir, f) for f in sorted(os.listdir(part_dir)) if f.endswith('.parquet')]
+    return files
+
+
+def read_cleaned_partitions(out_dir, months=None, columns=None, keep_redundant=False):
+    files = list_partition_files(out_dir, months)
+    if not files:
+        table = CLEANED_SCHEMA.empty_table()
+        return table_to_frame(table.select(columns or CLEANED_COLS), keep_redundant)
+    dataset = ds.dataset(files, schema=CLEANED_SCHEMA, format='parquet')
+    return table_to_frame(dataset.to_table(columns=columns), keep_redundant)
+
+
+def months_between(start_date, end_date):
+    return [str(p) for p in pd.period_range(start_date, end_date, freq='M')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream-clean the raw transit feed into month-partitioned Parquet.")
+    parser.add_argument("raw_path")
+    parser.add_argument("--out-dir", default="cleaned_transit_data")
+    parser.add_argument("--start-date", default=START_DATE)
+    parser.add_argument("--end-date", default=END_DATE)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--append", action="store_true", help="keep existing partitions instead of replacing them")
+    parser.add_argument("--upsert", action="store_true",
+                        help="keep existing partitions and replace rows whose natural key is already stored")
+    args = parser.parse_args()
+
+    clean_transit_csv(args.raw_path, args.out_dir, args.start_date, args.end_date,
+                      chunksize=args.chunksize, overwrite=not args.append, upsert=args.upsert)
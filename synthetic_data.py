@@ -0,0 +1,128 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from streaming_cleaner import RAW_DAY_FORMAT
+
+TIME_PERIODS = ['05:00-09:00', '09:00-16:00', '16:00-18:30', '18:30-22:30', '22:30-05:00']
+STREETS = ['Portage', 'Main', 'Pembina', 'Osborne', 'Henderson', 'Grant', 'McPhillips', 'Corydon', 'Sargent',
+           'Ellice', 'Logan', 'Selkirk', 'Transcona', 'St. Mary', 'Notre Dame', 'Kildonan', 'Wolseley', 'Arlington']
+DESTINATIONS = ['Polo Park', 'Downtown', 'University of Manitoba', 'Kildonan Place', 'St. Vital Centre',
+                'Garden City', 'Airport', 'Unicity', 'Seven Oaks', 'Windsor Park', 'Fort Garry', 'Norwood']
+HOLIDAYS = ['2024-10-14', '2024-11-11', '2024-12-25', '2024-12-26', '2025-01-01', '2025-02-17']
+START_DATE = '2024-10-01'
+
+
+def make_routes(n_routes=85, seed=42):
+    rng = np.random.default_rng(seed)
+    numbers = [str(n) for n in rng.choice(np.arange(1, 900), n_routes - 2, replace=False)] + ['BLUE', 'FX2']
+    names = [f"{rng.choice(STREETS)}-{rng.choice(STREETS)}" for _ in range(n_routes)]
+    dest = rng.choice(DESTINATIONS, size=(n_routes, 2))
+    return pd.DataFrame({
+        'route_number': np.repeat(numbers, 2),
+        'route_name': np.repeat(names, 2),
+        'route_destination': dest.ravel(),
+        # per-route base punctuality and volume so routes differ the way the real feed does
+        'late_share': np.repeat(rng.beta(2, 5, n_routes), 2),
+        'volume': np.repeat(rng.lognormal(4.5, 0.6, n_routes), 2),
+    })
+
+
+def make_hourly_weather(days, start_date=START_DATE, seed=42):
+    rng = np.random.default_rng(seed + 1)
+    times = pd.date_range(start_date, periods=days * 24, freq='h')
+    doy = times.dayofyear.to_numpy()
+    hour = times.hour.to_numpy()
+    temp = 2 - 18 * np.cos(2 * np.pi * (doy - 20) / 365) + 4 * np.sin(2 * np.pi * (hour - 9) / 24)
+    temp = temp + np.cumsum(rng.normal(0, 0.4, len(times))) * 0.2 + rng.normal(0, 1.5, len(times))
+    snow = np.where((temp < 1) & (rng.random(len(times)) < 0.08), rng.exponential(0.6, len(times)), 0.0)
+    precip = np.where(rng.random(len(times)) < 0.06, rng.exponential(0.5, len(times)), 0.0) + snow * 0.1
+    windspeed = np.abs(rng.normal(15, 7, len(times)))
+    return pd.DataFrame({
+        'datetime': times.strftime('%Y-%m-%dT%H:%M:%S'),
+        'temp': temp.round(1),
+        'dew': (temp - np.abs(rng.normal(4, 2, len(times)))).round(1),
+        'humidity': np.clip(rng.normal(75, 12, len(times)), 20, 100).round(1),
+        'precip': precip.round(3),
+        'snow': snow.round(2),
+        'windgust': (windspeed * rng.uniform(1.2, 2.0, len(times))).round(1),
+        'windspeed': windspeed.round(1),
+        'visibility': np.clip(24 - snow * 8 - rng.exponential(2, len(times)), 0.5, 24).round(1),
+    })
+
+
+def _day_types(days):
+    weekday = days.dayofweek.to_numpy()
+    out = np.where(weekday == 5, 'Saturday', np.where(weekday == 6, 'Sunday', 'Weekday'))
+    return np.where(days.strftime('%Y-%m-%d').isin(HOLIDAYS), 'Holiday', out)
+
+
+def make_transit_chunk(n_rows, routes, weather_daily, days=182, start_date=START_DATE, seed=42):
+    rng = np.random.default_rng(seed)
+    r = rng.integers(0, len(routes), n_rows)
+    day_idx = rng.integers(0, days, n_rows)
+    period = rng.integers(0, len(TIME_PERIODS), n_rows)
+    day = pd.Timestamp(start_date) + pd.to_timedelta(day_idx, unit='D')
+    day = pd.DatetimeIndex(day)
+
+    volume = routes['volume'].to_numpy()[r] * np.array([1.0, 2.2, 1.3, 0.8, 0.4])[period]
+    total = rng.poisson(volume)
+    # worse weather, more late stops
+    snow = weather_daily['snow'].to_numpy()[day_idx]
+    gust = weather_daily['windgust'].to_numpy()[day_idx]
+    late_p = np.clip(routes['late_share'].to_numpy()[r] + 0.04 * snow + 0.003 * np.maximum(gust - 25, 0), 0, 0.95)
+    late = rng.binomial(total, late_p)
+    early = rng.binomial(total - late, 0.25)
+    on_time = total - late - early
+
+    numbers = routes['route_number'].to_numpy()[r]
+    dests = routes['route_destination'].to_numpy()[r]
+    day_types = _day_types(day)
+    periods = np.asarray(TIME_PERIODS)[period]
+    keys = (pd.Series(numbers) + '##' + dests + '##' + day.strftime('%Y%m%d000000').to_numpy()
+            + '##' + day_types + '##' + periods)
+    return pd.DataFrame({
+        'Route Number': numbers,
+        'Route Name': routes['route_name'].to_numpy()[r],
+        'Route Destination': dests,
+        'Day Type': day_types,
+        'Day': day.strftime(RAW_DAY_FORMAT),
+        'Time Period': periods,
+        'Early Stops': early,
+        'Late Stops': late.astype(float),
+        'On-Time Stops': on_time.astype(float),
+        'Key': keys.to_numpy(),
+    })
+
+
+def write_synthetic_dataset(raw_path, weather_path, n_rows, days=182, chunk_rows=1_000_000, seed=42,
+                            start_date=START_DATE):
+    routes = make_routes(seed=seed)
+    weather = make_hourly_weather(days, start_date, seed)
+    weather.to_csv(weather_path, index=False)
+    daily = weather.assign(day=weather['datetime'].str[:10]).groupby('day')[['snow', 'windgust']].agg(
+        {'snow': 'sum', 'windgust': 'max'}).reset_index(drop=True)
+
+    written = 0
+    chunk_id = 0
+    while written < n_rows:
+        n = min(chunk_rows, n_rows - written)
+        chunk = make_transit_chunk(n, routes, daily, days, start_date, seed + chunk_id)
+        chunk.to_csv(raw_path, mode='w' if chunk_id == 0 else 'a', header=chunk_id == 0, index=False)
+        written += n
+        chunk_id += 1
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic raw transit feed + hourly weather.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--raw", default="synthetic_transitData.csv")
+    parser.add_argument("--weather", default="synthetic_weather_hourly.csv")
+    parser.add_argument("--days", type=int, default=182)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    n = write_synthetic_dataset(args.raw, args.weather, args.rows, args.days, seed=args.seed)
+    print(f"✅ Wrote {n:,} synthetic transit rows to '{args.raw}' and hourly weather to '{args.weather}'")
@@ -0,0 +1,175 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR, load_frame
+from evaluation import classification_metrics, regression_metrics
+from preprocessing import (CLASS_TARGET, REG_TARGET, FeatureMatrix, TransitPreprocessor, build_feature_matrix,
+                           on_time_status)
+
+FAMILIES = ('xgb', 'linear', 'rf')
+N_FOLDS = 5
+# the first fold trains on at least this share of the date range
+MIN_TRAIN_FRACTION = 0.5
+XGB_ROUNDS = 100
+XGB_PARAMS = {'tree_method': 'hist', 'seed': 42, 'max_bin': 256}
+
+
+def build_time_ordered(df, preprocessor=None):
+    # rows sorted by day once, so every fold's train set is a prefix and its test set the next block:
+    # both are views into the one matrix. Encoders only learn vocabularies, so fitting them on all rows
+    # leaks no labels.
+    days = pd.to_datetime(df['day']).to_numpy().astype('datetime64[D]')
+    order = np.argsort(days, kind='stable')
+    preprocessor = preprocessor or TransitPreprocessor().fit(df)
+    values = preprocessor.transform(df.iloc[order])
+    return FeatureMatrix(values, preprocessor, len(values)), days[order]
+
+
+def rolling_origin_folds(days, n_folds=N_FOLDS, min_train_fraction=MIN_TRAIN_FRACTION, gap_days=0):
+    # forward chaining by date: fold k trains on every day before its cutoff and tests on the next block of
+    # days; `gap_days` leaves an embargo between the two so adjacent-day weather cannot leak either
+    unique_days = np.unique(days)
+    first_test = int(len(unique_days) * min_train_fraction)
+    edges = np.linspace(first_test, len(unique_days), n_folds + 1).round().astype(int)
+    folds = []
+    for k in range(n_folds):
+        test_start_day, test_end_day = unique_days[edges[k]], unique_days[min(edges[k + 1], len(unique_days)) - 1]
+        train_end_day = test_start_day - np.timedelta64(gap_days, 'D')
+        train_end = int(np.searchsorted(days, train_end_day, side='left'))
+        test_start = int(np.searchsorted(days, test_start_day, side='left'))
+        test_end = int(np.searchsorted(days, test_end_day, side='right'))
+        if train_end == 0 or test_end <= test_start:
+            continue
+        folds.append({'fold': k, 'train_end': train_end, 'test_start': test_start, 'test_end': test_end,
+                      'train_to': str(days[train_end - 1]), 'test_from': str(test_start_day),
+                      'test_to': str(test_end_day)})
+    return folds
+
+
+def _target_arrays(features, target):
+    # same column ranges as FeatureMatrix.regression_split / classification_split
+    values = features.values
+    if target == REG_TARGET:
+        return values[:, 1:], values[:, 0]
+    return values[:, :-1], values[:, -1].astype(np.int64)
+
+
+def _score(target, y_true, preds):
+    if target == REG_TARGET:
+        return regression_metrics(y_true, preds)
+    return classification_metrics(y_true, (preds > 0.5).astype(int) if preds.dtype.kind == 'f' else preds)
+
+
+class FoldRunner:
+    def __init__(self, features, target, family, nthread=1, rounds=XGB_ROUNDS):
+        self.target = target
+        self.family = family
+        self.nthread = nthread
+        self.rounds = rounds
+        self.X, self.y = _target_arrays(features, target)
+        if family == 'xgb':
+            import xgboost as xgb
+
+            self.xgb = xgb
+            # quantized once: each fold's training matrix reuses these bin cuts through ref= instead of
+            # re-sketching its prefix (cuts see feature values only, never labels)
+            self.reference = xgb.QuantileDMatrix(self.X, self.y, max_bin=XGB_PARAMS['max_bin'], nthread=nthread)
+
+    def _fit_predict(self, X_train, y_train, X_test):
+        if self.family == 'xgb':
+            objective = 'reg:squarederror' if self.target == REG_TARGET else 'binary:logistic'
+            dtrain = self.xgb.QuantileDMatrix(X_train, y_train, ref=self.reference)
+            booster = self.xgb.train(dict(XGB_PARAMS, objective=objective, nthread=self.nthread), dtrain, self.rounds)
+            return booster.inplace_predict(X_test)
+        if self.family == 'linear':
+            from sklearn.linear_model import LinearRegression, LogisticRegression
+            if self.target == REG_TARGET:
+                return LinearRegression().fit(X_train, y_train).predict(X_test)
+            return LogisticRegression(max_iter=1000).fit(X_train, y_train).predict_proba(X_test)[:, 1]
+        from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+        if self.target == REG_TARGET:
+            return RandomForestRegressor(random_state=42, n_jobs=self.nthread).fit(X_train, y_train).predict(X_test)
+        model = RandomForestClassifier(random_state=42, n_jobs=self.nthread).fit(X_train, y_train)
+        return model.predict_proba(X_test)[:, 1]
+
+    def __call__(self, fold):
+        started = time.perf_counter()
+        train, test = slice(0, fold['train_end']), slice(fold['test_start'], fold['test_end'])
+        preds = self._fit_predict(self.X[train], self.y[train], self.X[test])
+        metrics = _score(self.target, self.y[test], np.asarray(preds))
+        return {**fold, 'n_train': fold['train_end'], 'n_test': fold['test_end'] - fold['test_start'], **metrics,
+                'wall_s': round(time.perf_counter() - started, 3)}
+
+    def shuffled(self, df, preprocessor):
+        # the old random 80/20 split, for comparison with the forward-chaining estimate
+        X_train, X_test, y_train, y_test = _shuffled_split(df, preprocessor, self.target)
+        return _score(self.target, y_test, np.asarray(self._fit_predict(X_train, y_train, X_test)))
+
+
+def _shuffled_split(df, preprocessor, target):
+    features = build_feature_matrix(df, preprocessor)
+    return features.regression_split() if target == REG_TARGET else features.classification_split()
+
+
+def confidence_intervals(folds, metrics, level=0.95):
+    # t interval over fold scores; with few folds it is wide, which is the point
+    from scipy import stats
+
+    k = len(folds)
+    rows = {}
+    for m in metrics:
+        scores = folds[m].to_numpy(dtype=float)
+        mean, sd = scores.mean(), scores.std(ddof=1) if k > 1 else 0.0
+        half = stats.t.ppf(0.5 + level / 2, k - 1) * sd / np.sqrt(k) if k > 1 else np.nan
+        rows[m] = {'mean': mean, 'std': sd, 'ci_low': mean - half, 'ci_high': mean + half}
+    return pd.DataFrame(rows).T
+
+
+def time_series_cv(df, target=CLASS_TARGET, family='xgb', n_folds=N_FOLDS, min_train_fraction=MIN_TRAIN_FRACTION,
+                   gap_days=0, parallel_folds=None, total_cpus=None, compare_shuffled=False):
+    features, days = build_time_ordered(df)
+    folds = rolling_origin_folds(days, n_folds, min_train_fraction, gap_days)
+    total_cpus = total_cpus or os.cpu_count() or 1
+    parallel_folds = max(1, min(parallel_folds or total_cpus, len(folds)))
+    runner = FoldRunner(features, target, family, nthread=max(1, total_cpus // parallel_folds))
+
+    print(f"🧪 {family} / {target}: {len(folds)} forward-chaining folds, {parallel_folds} in parallel")
+    # threads, not processes: XGBoost and sklearn release the GIL while fitting, and every fold reads the
+    # same matrix and quantile cuts in place
+    with ThreadPoolExecutor(max_workers=parallel_folds) as pool:
+        results = list(pool.map(runner, folds))
+    table = pd.DataFrame(results).set_index('fold')
+
+    metrics = ['mae', 'rmse', 'r2'] if target == REG_TARGET else ['accuracy', 'f1']
+    summary = confidence_intervals(table, metrics)
+    if compare_shuffled:
+        summary['shuffled_split'] = pd.Series(runner.shuffled(df, features.preprocessor))
+    return table, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin (forward-chaining by date) cross-validation.")
+    parser.add_argument("csv_path", nargs="?", default="merged_transit_weather.csv")
+    parser.add_argument("--target", choices=[CLASS_TARGET, REG_TARGET], default=CLASS_TARGET)
+    parser.add_argument("--family", choices=FAMILIES, default="xgb")
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--min-train-fraction", type=float, default=MIN_TRAIN_FRACTION)
+    parser.add_argument("--gap-days", type=int, default=0, help="embargo between the training and test days")
+    parser.add_argument("--parallel-folds", type=int, default=None)
+    parser.add_argument("--total-cpus", type=int, default=None)
+    parser.add_argument("--compare-shuffled", action="store_true", help="also score the old random 80/20 split")
+    args = parser.parse_args()
+
+    df = load_frame(args.csv_path, CACHE_DIR)
+    df[CLASS_TARGET] = on_time_status(df)
+    table, summary = time_series_cv(df, args.target, args.family, args.folds, args.min_train_fraction, args.gap_days,
+                                    args.parallel_folds, args.total_cpus, args.compare_shuffled)
+    print("\n📊 Per-fold results")
+    print(table.round(4).to_string())
+    print("\n📊 Mean with 95% confidence interval across folds")
+    print(summary.round(4).to_string())
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def period_table(labels):
+    # parse each distinct range string ('05:00-09:00', '22:30-05:00') once
+    parts = pd.Series(labels, dtype=str).str.split('-', n=1, expand=True).reindex(columns=[0, 1]).astype(str)
+    start = pd.to_timedelta(parts[0].str.strip() + ':00', errors='coerce')
+    end = pd.to_timedelta(parts[1].str.strip() + ':00', errors='coerce')
+    start_min = (start / pd.Timedelta(minutes=1)).to_numpy(dtype=np.float32)
+    end_min = (end / pd.Timedelta(minutes=1)).to_numpy(dtype=np.float32)
+    # ranges that end at or before they start run past midnight
+    end_min = np.where(end_min <= start_min, end_min + MINUTES_PER_DAY, end_min).astype(np.float32)
+    return pd.DataFrame({'start_min': start_min, 'end_min': end_min, 'duration_min': end_min - start_min})
+
+
+def as_categorical(values):
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    return values.astype('category')
+
+
+def parse_time_periods(values):
+    # categorical codes index into a per-category table; one extra NaN row catches missing (-1) codes
+    cat = as_categorical(values)
+    codes = cat.cat.codes.to_numpy()
+    table = period_table(cat.cat.categories)
+    lookup = np.vstack([table.to_numpy(), np.full((1, table.shape[1]), np.nan, dtype=np.float32)])
+    rows = lookup[codes]
+    out = pd.DataFrame(rows, columns=table.columns, index=cat.index)
+    out.insert(0, 'time_period', cat)
+    return out
+
+
+def period_offsets(values):
+    # start/end as timedelta64 offsets from midnight, ready to add to a datetime64 day
+    parsed = parse_time_periods(values)
+    start = (parsed['start_min'].to_numpy(dtype=np.float64) * 60e9).astype('timedelta64[ns]')
+    end = (parsed['end_min'].to_numpy(dtype=np.float64) * 60e9).astype('timedelta64[ns]')
+    return start, end
+
+
+def start_hour(values):
+    return np.floor(parse_time_periods(values)['start_min'].to_numpy(dtype=np.float64) / 60)
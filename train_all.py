@@ -0,0 +1,149 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data_processor import TransitDataProcessor
+from evaluation import classification_metrics, regression_metrics
+
+# task name -> (split, family)
+TASKS = {
+    'rf_classifier': ('classification', 'rf'),
+    'rf_regressor': ('regression', 'rf'),
+    'logistic_classifier': ('classification', 'linear'),
+    'linear_regressor': ('regression', 'linear'),
+    'xgb_classifier': ('classification', 'xgb'),
+    'xgb_regressor': ('regression', 'xgb'),
+}
+
+
+class SharedMatrix:
+    # one copy of the feature matrix in /dev/shm; workers map it instead of pickling it
+    def __init__(self, values):
+        self.shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        self.shape = values.shape
+        self.dtype = values.dtype.str
+        np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)[:] = values
+
+    @property
+    def handle(self):
+        return self.shm.name, self.shape, self.dtype
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _fit(task, X_train, X_test, y_train, y_test, n_jobs):
+    from model_linear import train_linear_regression, train_logistic_regression
+    from model_rf import train_rf_classifier, train_rf_regressor
+    from model_xgb import XGBoostTrainer
+
+    if task == 'rf_classifier':
+        return train_rf_classifier(X_train, X_test, y_train, y_test, n_jobs=n_jobs)
+    if task == 'rf_regressor':
+        return train_rf_regressor(X_train, X_test, y_train, y_test, n_jobs=n_jobs)
+    if task == 'logistic_classifier':
+        return train_logistic_regression(X_train, X_test, y_train, y_test)
+    if task == 'linear_regressor':
+        return train_linear_regression(X_train, X_test, y_train, y_test, n_jobs=n_jobs)
+
+    trainer = XGBoostTrainer(csv_path=None)
+    if task == 'xgb_classifier':
+        trainer.X_train_class, trainer.X_test_class = X_train, X_test
+        trainer.y_train_class, trainer.y_test_class = y_train, y_test
+        trainer.train_xgb_classifier(n_jobs=n_jobs)
+        return trainer.classifier_model
+    trainer.X_train_reg, trainer.X_test_reg, trainer.y_train_reg, trainer.y_test_reg = X_train, X_test, y_train, y_test
+    trainer.train_xgb_regressor(n_jobs=n_jobs)
+    return trainer.regressor_model
+
+
+def run_task(task, handle, n_train, n_jobs):
+    from threadpoolctl import threadpool_limits
+
+    name, shape, dtype = handle
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        values = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        split, family = TASKS[task]
+        # same column ranges as FeatureMatrix.classification_split / regression_split
+        if split == 'classification':
+            X, y = values[:, :-1], values[:, -1].astype(np.int64)
+        else:
+            X, y = values[:, 1:], values[:, 0]
+        X_train, X_test, y_train, y_test = X[:n_train], X[n_train:], y[:n_train], y[n_train:]
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        with threadpool_limits(limits=n_jobs), contextlib.redirect_stdout(io.StringIO()):
+            model = _fit(task, X_train, X_test, y_train, y_test, n_jobs)
+            preds = model.predict(X_test)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+
+        metrics = classification_metrics(y_test, preds) if split == 'classification' else regression_metrics(y_test, preds)
+        # ru_maxrss is KiB on Linux, bytes on macOS; shared matrix pages this worker touched are included
+        scale = 1 if sys.platform == 'darwin' else 1024
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+        return {'model': task, 'family': family, 'task': split, **metrics,
+                'wall_s': round(wall, 3), 'cpu_s': round(cpu, 3), 'peak_rss_mb': round(peak_rss_mb, 1)}
+    finally:
+        shm.close()
+
+
+def train_all(csv_path, tasks=None, cpus_per_model=1, total_cpus=None):
+    tasks = list(tasks or TASKS)
+    total_cpus = total_cpus or os.cpu_count() or 1
+    workers = max(1, min(len(tasks), total_cpus // max(cpus_per_model, 1)))
+
+    processor = TransitDataProcessor(csv_path)
+    processor.load_data()
+    processor.create_on_time_status()
+    processor.preprocess_all()
+    features = processor.features
+
+    shared = SharedMatrix(features.values)
+    print(f"🧠 Training {len(tasks)} models on {workers} workers x {cpus_per_model} CPU(s)")
+    # a fresh process per model keeps each peak-RSS reading specific to that model
+    pool_kwargs = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    rows = []
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 **pool_kwargs) as pool:
+            futures = {pool.submit(run_task, t, shared.handle, features.n_train, cpus_per_model): t for t in tasks}
+            for future in as_completed(futures):
+                row = future.result()
+                print(f"✅ {row['model']} done in {row['wall_s']:.2f}s")
+                rows.append(row)
+    finally:
+        shared.close()
+
+    table = pd.DataFrame(rows).set_index('model').loc[[t for t in tasks]]
+    print(f"\n📊 All models finished in {time.perf_counter() - started:.2f}s")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load/preprocess once, then train every model in parallel.")
+    parser.add_argument("csv_path", nargs="?", default="cleaned_transit_data.csv")
+    parser.add_argument("--models", nargs="*", choices=list(TASKS), help="subset of models to train")
+    parser.add_argument("--cpus-per-model", type=int, default=1)
+    parser.add_argument("--total-cpus", type=int, default=None)
+    parser.add_argument("--out", help="write the metrics table to this CSV")
+    args = parser.parse_args()
+
+    table = train_all(args.csv_path, args.models, args.cpus_per_model, args.total_cpus)
+    print(table.round(4).to_string())
+    if args.out:
+        table.to_csv(args.out)
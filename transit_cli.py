@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# only the standard library is imported up here; each subcommand pulls in just what it uses, so
+# `predict` never loads matplotlib/seaborn and only loads sklearn or xgboost for the model kind it serves
+COLD_START_TARGET_S = 3.0
+
+
+def cmd_clean(args):
+    from streaming_cleaner import clean_transit_csv
+    clean_transit_csv(args.raw_path, args.out_dir, args.start_date, args.end_date,
+                      overwrite=not (args.append or args.upsert), upsert=args.upsert)
+
+
+def cmd_ingest(args):
+    from ingestion import ingest
+    summary = ingest(args.transit_url, args.weather_url, args.out_dir, args.weather_dir, args.start_date,
+                     args.end_date, concurrency=args.concurrency, upsert=args.upsert)
+    print(json.dumps(summary))
+
+
+def cmd_join(args):
+    from transit_weather_join import join_transit_weather
+    join_transit_weather(args.transit_source, args.weather_path, args.out, months=args.months)
+
+
+def cmd_train(args):
+    from model_store import holdout_keys, load_training_matrix, save_serving_models
+
+    features, store = load_training_matrix(args.csv_path, args.weather)
+    save_serving_models(features, args.out, args.kind, store, holdout_keys(args.csv_path, features))
+
+
+def _read_records(args):
+    import pandas as pd
+    if args.csv:
+        return pd.read_csv(args.csv)
+    records = json.loads(args.json if args.json else sys.stdin.read())
+    return pd.DataFrame(records if isinstance(records, list) else [records])
+
+
+def cmd_predict(args):
+    if args.sharded:
+        from route_shards import ShardedModels
+        models = ShardedModels(args.model_dir)
+    else:
+        from model_store import ServingModels
+        models = ServingModels(args.model_dir)
+    preds = models.predict(_read_records(args))
+    names = list(preds)
+    for row in zip(*(preds[n] for n in names)):
+        print(json.dumps({n: round(float(v), 4) for n, v in zip(names, row)}))
+
+
+def cmd_serve(args):
+    from scoring_service import serve
+    server = serve(args.model_dir, args.host, args.port, sharded=args.sharded)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def cmd_shards(args):
+    from route_shards import train_shards
+    train_shards(args.source, args.model_dir, args.layout_dir, args.clusters, workers=args.workers, force=args.force)
+
+
+def cmd_scenarios(args):
+    from scenario_engine import route_axis, run_scenarios
+
+    axes = {'route': route_axis(args.routes_from) if args.routes_from else 'all', 'time_period': 'all',
+            'day_type': 'all'}
+    if args.spec:
+        with open(args.spec) as f:
+            axes.update(json.load(f)['axes'])
+    table = run_scenarios(args.model_dir, axes, args.group_by)
+    if args.out:
+        table.to_csv(args.out, index=False)
+    else:
+        print(table.round(4).to_string(index=False))
+
+
+def cmd_cold_start(args):
+    # each run is a fresh interpreter: imports, artifact load and one prediction, end to end
+    record = json.dumps([{'route_number': '66', 'route_destination': 'Polo Park', 'day_type': 'Weekday',
+                          'time_period': '16:00-18:30'}])
+    command = [sys.executable, os.path.abspath(__file__), 'predict', args.model_dir, '--json', record]
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    print(f"⏱️ time to first prediction: median {median:.3f}s, max {max(timings):.3f}s over {args.runs} cold runs")
+    if median > args.target_s:
+        print(f"❌ Above the {args.target_s:.2f}s target")
+        sys.exit(1)
+    print(f"✅ Within the {args.target_s:.2f}s target")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="transit_cli", description="Transit delay pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("clean", help="stream-clean a raw export into month partitions")
+    p.add_argument("raw_path")
+    p.add_argument("--out-dir", default="cleaned_transit_data")
+    p.add_argument("--start-date", default="2024-10-01")
+    p.add_argument("--end-date", default="2025-03-31")
+    p.add_argument("--append", action="store_true")
+    p.add_argument("--upsert", action="store_true")
+    p.set_defaults(func=cmd_clean)
+
+    p = sub.add_parser("ingest", help="pull paginated transit and weather feeds into month partitions")
+    p.add_argument("--transit-url")
+    p.add_argument("--weather-url")
+    p.add_argument("--out-dir", default="cleaned_transit_data")
+    p.add_argument("--weather-dir", default="weather_data")
+    p.add_argument("--start-date", default="2024-10-01")
+    p.add_argument("--end-date", default="2025-03-31")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--upsert", action="store_true")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("join", help="join cleaned transit data to hourly weather")
+    p.add_argument("transit_source")
+    p.add_argument("weather_path")
+    p.add_argument("--out", default="merged_transit_weather.csv")
+    p.add_argument("--months", nargs="*")
+    p.set_defaults(func=cmd_join)
+
+    p = sub.add_parser("train", help="train and save versioned serving artifacts")
+    p.add_argument("csv_path", nargs="?", default="merged_transit_weather.csv")
+    p.add_argument("--out", default="models")
+    p.add_argument("--kind", choices=("xgb", "rf", "linear"), default="xgb")
+    p.add_argument("--weather", help="hourly weather CSV/directory: add lagged and rolling weather features")
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser("predict", help="score records with saved artifacts (JSON lines out)")
+    p.add_argument("model_dir")
+    p.add_argument("--csv", help="CSV of request records")
+    p.add_argument("--json", help="a JSON record or list of records (default: read stdin)")
+    p.add_argument("--sharded", action="store_true", help="use per-route shard models where trained")
+    p.set_defaults(func=cmd_predict)
+
+    p = sub.add_parser("serve", help="HTTP scoring service")
+    p.add_argument("model_dir")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--sharded", action="store_true", help="use per-route shard models where trained")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("shards", help="train per-route shard models next to a saved global model")
+    p.add_argument("source", help="merged CSV or month-partitioned store")
+    p.add_argument("model_dir")
+    p.add_argument("--layout-dir", default="route_shards_data")
+    p.add_argument("--clusters", type=int, default=None)
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--force", action="store_true")
+    p.set_defaults(func=cmd_shards)
+
+    p = sub.add_parser("scenarios", help="score a route x period x day type x weather grid")
+    p.add_argument("model_dir")
+    p.add_argument("--spec", help="JSON with an 'axes' mapping, e.g. a 'weather' list of scenarios")
+    p.add_argument("--routes-from")
+    p.add_argument("--group-by", nargs="*", default=["route"])
+    p.add_argument("--out")
+    p.set_defaults(func=cmd_scenarios)
+
+    p = sub.add_parser("cold-start", help="measure time to first prediction from a cold process")
+    p.add_argument("model_dir")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--target-s", type=float, default=COLD_START_TARGET_S)
+    p.set_defaults(func=cmd_cold_start)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
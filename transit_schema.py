@@ -0,0 +1,118 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from time_periods import as_categorical, period_offsets
+
+# declared in-memory schema for the cleaned and merged datasets; the on-disk formats are unchanged
+CATEGORICAL_COLS = ['route_number', 'route_name', 'route_destination', 'day_type', 'time_period']
+TIMESTAMP_COLS = ['day']
+COUNT_COLS = ['early_stops', 'late_stops', 'on-time_stops']
+# key is rebuilt from its parts, datetime_x is day + period start, date is day, datetime_y is the first weather hour
+REDUNDANT_COLS = ['key', 'datetime_x', 'datetime_y', 'date']
+KEY_PARTS = ['route_number', 'route_destination', 'day', 'day_type', 'time_period']
+KEY_DAY_FORMAT = '%Y%m%d%H%M%S'
+
+
+def _parse_timestamps(values):
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]')
+    # few distinct days per file, so parse each once
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques), errors='coerce').values.astype('datetime64[ns]')
+    parsed = np.append(parsed, np.datetime64('NaT', 'ns'))
+    return pd.Series(parsed[codes], index=values.index)
+
+
+def as_counts(values):
+    # one fixed width for every frame (float32, as CLEANED_SCHEMA stores them): a per-frame downcast gave small
+    # partitions int8 counts, and early_stops + late_stops wrapped around in on_time_status
+    return pd.to_numeric(values, errors='coerce').astype(np.float32)
+
+
+def apply_schema(df, keep_redundant=False):
+    drop = [] if keep_redundant else [c for c in REDUNDANT_COLS if c in df.columns]
+    df = df.drop(columns=drop)
+    for col in df.columns:
+        if col in CATEGORICAL_COLS:
+            df[col] = as_categorical(df[col])
+        elif col in TIMESTAMP_COLS:
+            df[col] = _parse_timestamps(df[col])
+        elif col in COUNT_COLS:
+            df[col] = as_counts(df[col])
+        elif col not in REDUNDANT_COLS and pd.api.types.is_float_dtype(df[col]):
+            # weather readings carry a few significant digits; float32 is what the feature matrix stores anyway
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def csv_read_options(path, keep_redundant=False):
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in header if keep_redundant or c not in REDUNDANT_COLS]
+    # categoricals are built by the parser, so the per-row object strings never exist
+    dtype = {c: 'category' for c in usecols if c in CATEGORICAL_COLS}
+    return usecols, dtype
+
+
+def read_typed_csv(path, keep_redundant=False, columns=None, chunksize=None):
+    usecols, dtype = csv_read_options(path, keep_redundant)
+    if columns is not None:
+        usecols = [c for c in usecols if c in columns]
+        dtype = {c: t for c, t in dtype.items() if c in usecols}
+    reader = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+    if chunksize is None:
+        return apply_schema(reader, keep_redundant)
+    return (apply_schema(chunk, keep_redundant) for chunk in reader)
+
+
+def table_to_frame(table, keep_redundant=False):
+    # dictionary-encode in Arrow so to_pandas hands back categoricals without materialising strings
+    names = [c for c in table.column_names if keep_redundant or c not in REDUNDANT_COLS]
+    table = table.select(names)
+    for i, name in enumerate(names):
+        if name in CATEGORICAL_COLS and pa.types.is_string(table.schema.field(i).type):
+            table = table.set_column(i, name, table.column(i).dictionary_encode())
+    return apply_schema(table.to_pandas(), keep_redundant)
+
+
+def build_key(df):
+    # the original composite key, e.g. 66##Polo Park##20250201000000##Saturday##16:00-18:30
+    parts = []
+    for col in KEY_PARTS:
+        values = df[col]
+        if col in TIMESTAMP_COLS:
+            codes, uniques = pd.factorize(values)
+            labels = np.append(pd.DatetimeIndex(uniques).strftime(KEY_DAY_FORMAT).to_numpy(dtype=object), 'nan')
+        else:
+            cat = as_categorical(values)
+            codes = cat.cat.codes.to_numpy()
+            labels = np.append(cat.cat.categories.astype(str).to_numpy(dtype=object), 'nan')
+        parts.append(labels[codes])
+    key = parts[0]
+    for part in parts[1:]:
+        key = key + '##' + part
+    return pd.Series(key, index=df.index, name='key')
+
+
+def interval_start(df):
+    # what datetime_x used to carry: the day plus the start of its time period
+    start, _ = period_offsets(df['time_period'])
+    return pd.Series(df['day'].to_numpy(dtype='datetime64[ns]') + start, index=df.index, name='datetime')
+
+
+def frame_memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare default vs schema-typed memory for a cleaned/merged CSV.")
+    parser.add_argument("csv_path")
+    args = parser.parse_args()
+
+    before = frame_memory_mb(pd.read_csv(args.csv_path))
+    typed = read_typed_csv(args.csv_path)
+    after = frame_memory_mb(typed)
+    print(typed.dtypes.to_string())
+    print(f"✅ {before:,.1f} MB with default dtypes -> {after:,.1f} MB typed ({before / after:.1f}x smaller)")
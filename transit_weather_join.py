@@ -0,0 +1,199 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from streaming_cleaner import (list_month_partitions, list_partition_files, month_partition_dir, parse_days,
+                               read_cleaned_partitions)
+from time_periods import as_categorical, period_table
+from transit_schema import read_typed_csv
+
+LOCAL_TZ = 'America/Winnipeg'
+WEATHER_STEP = pd.Timedelta(hours=1)
+# gaps in the hourly series fall back to the nearest reading within this distance
+ASOF_TOLERANCE = pd.Timedelta(hours=3)
+CSV_CHUNK_SIZE = 500_000
+
+# output column -> (hourly source column, aggregation over the hours an interval covers)
+WEATHER_AGGREGATIONS = {
+    'tempmax': ('temp', 'max'),
+    'tempmin': ('temp', 'min'),
+    'temp': ('temp', 'mean'),
+    'dew': ('dew', 'mean'),
+    'humidity': ('humidity', 'mean'),
+    'precip': ('precip', 'sum'),
+    'snow': ('snow', 'sum'),
+    'windgust': ('windgust', 'max'),
+    'windspeed': ('windspeed', 'mean'),
+    'visibility': ('visibility', 'mean'),
+}
+
+
+def load_hourly_weather(weather_path, tz=LOCAL_TZ):
+    if os.path.isdir(weather_path):
+        # month-partitioned pages written by ingestion.py
+        weather = pd.concat([pq.read_table(f).to_pandas() for f in list_partition_files(weather_path)],
+                            ignore_index=True)
+    else:
+        weather = pd.read_csv(weather_path)
+    times = pd.to_datetime(weather['datetime'], errors='coerce')
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert(tz).dt.tz_localize(None)
+    weather['datetime'] = times
+    weather = weather.dropna(subset=['datetime'])
+    weather = weather.sort_values('datetime').drop_duplicates('datetime', keep='last')
+    return weather.reset_index(drop=True)
+
+
+def _interval_aggregates(starts, ends, weather):
+    times = weather['datetime'].values
+    # an hourly reading at h covers [h, h + step); it overlaps [start, end) when start - step < h < end
+    lo = np.searchsorted(times, starts - WEATHER_STEP.to_timedelta64(), side='right')
+    hi = np.searchsorted(times, ends, side='left')
+    empty = hi <= lo
+
+    out = {}
+    for name, (src, how) in WEATHER_AGGREGATIONS.items():
+        if src not in weather.columns:
+            out[name] = np.full(len(starts), np.nan)
+            continue
+        values = weather[src].to_numpy(dtype='float64')
+        valid = ~np.isnan(values)
+        if how in ('sum', 'mean'):
+            sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+            counts = np.concatenate([[0], np.cumsum(valid)])
+            total = sums[hi] - sums[lo]
+            n = counts[hi] - counts[lo]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = total if how == 'sum' else total / n
+            result = np.where(n > 0, result, np.nan)
+        else:
+            ufunc, pad = (np.maximum, -np.inf) if how == 'max' else (np.minimum, np.inf)
+            # reduceat over interleaved (lo, hi) pairs reduces each [lo, hi) slice in one pass
+            padded = np.append(np.where(valid, values, pad), pad)
+            bounds = np.column_stack([lo, np.maximum(hi, lo)]).ravel()
+            result = ufunc.reduceat(padded, bounds)[::2]
+            result = np.where(np.isinf(result) | empty, np.nan, result)
+        out[name] = result
+
+    out = pd.DataFrame(out)
+    # months outside the weather file's range get an empty slice; every interval is then unmatched
+    first_hour = np.full(len(starts), np.datetime64('NaT', 'ns'))
+    if len(times):
+        first_hour = np.where(empty, first_hour, times[np.minimum(lo, len(times) - 1)])
+    out['datetime_y'] = first_hour
+    return out, empty
+
+
+def _asof_fallback(intervals, aggregates, missing, weather):
+    if not missing.any() or weather.empty:
+        return aggregates
+    probe = pd.DataFrame({'datetime': intervals.loc[missing, 'start'].values, 'row': np.flatnonzero(missing)})
+    probe = probe.sort_values('datetime')
+    sources = sorted({src for src, _ in WEATHER_AGGREGATIONS.values() if src in weather.columns})
+    lookup = weather[['datetime'] + sources].assign(hour=weather['datetime'])
+    nearest = pd.merge_asof(probe, lookup, on='datetime', direction='nearest', tolerance=ASOF_TOLERANCE)
+    rows = nearest['row'].values
+    for name, (src, _) in WEATHER_AGGREGATIONS.items():
+        if src in nearest.columns:
+            aggregates.loc[rows, name] = nearest[src].values
+    aggregates.loc[rows, 'datetime_y'] = nearest['hour'].values
+    return aggregates
+
+
+def join_chunk(transit, weather):
+    if transit['day'].dtype.kind != 'M':
+        transit = transit.assign(day=parse_days(transit['day'], fmt=None))
+    transit = transit.dropna(subset=['day'])
+
+    # every transit row on the same day and period sees the same weather, so aggregate per unique interval;
+    # the pair is factorized on integer codes, and each period string is parsed once per category
+    day_codes, day_values = pd.factorize(transit['day'])
+    period = as_categorical(transit['time_period'])
+    n_periods = len(period.cat.categories) + 1
+    pair_codes, pairs = pd.factorize(day_codes * n_periods + period.cat.codes.to_numpy() + 1)
+    days = np.asarray(day_values, dtype='datetime64[ns]')[pairs // n_periods]
+    table = period_table(period.cat.categories)
+    # code -1 (missing period) lands on the leading NaN row
+    minutes = np.vstack([np.full((1, 2), np.nan), table[['start_min', 'end_min']].to_numpy(dtype=np.float64)])
+    minutes = minutes[pairs % n_periods]
+    intervals = pd.DataFrame({
+        'start': days + (minutes[:, 0] * 60e9).astype('timedelta64[ns]'),
+        'end': days + (minutes[:, 1] * 60e9).astype('timedelta64[ns]'),
+    })
+
+    has_bounds = intervals['start'].notna().values
+    starts = intervals['start'].values
+    ends = intervals['end'].values
+    aggregates, empty = _interval_aggregates(starts, ends, weather)
+    aggregates = _asof_fallback(intervals, aggregates, empty & has_bounds, weather)
+    aggregates.loc[~has_bounds] = np.nan
+
+    joined = transit.reset_index(drop=True)
+    joined['datetime_x'] = intervals['start'].values[pair_codes]
+    joined['date'] = joined['day'].dt.normalize()
+    for col in ['datetime_y'] + list(WEATHER_AGGREGATIONS):
+        joined[col] = aggregates[col].values[pair_codes]
+
+    # keep rows whose interval found weather, like the old inner merge did
+    return joined.dropna(subset=['datetime_y'])
+
+
+def iter_transit_chunks(transit_source, months=None, chunksize=CSV_CHUNK_SIZE):
+    if os.path.isdir(transit_source):
+        for month in list_month_partitions(transit_source):
+            if months is None or month in months:
+                yield month, read_cleaned_partitions(transit_source, months=[month], keep_redundant=True)
+    else:
+        # key stays in: the merged output keeps the cleaned file's columns
+        for i, chunk in enumerate(read_typed_csv(transit_source, keep_redundant=True, chunksize=chunksize)):
+            yield f"chunk-{i:05d}", chunk
+
+
+def _write_output(joined, out_path, label, first):
+    if out_path.endswith('.csv'):
+        joined.to_csv(out_path, mode='w' if first else 'a', header=first, index=False)
+        return
+    months = joined['day'].dt.strftime('%Y-%m')
+    for month, part in joined.groupby(months, sort=False):
+        part_dir = month_partition_dir(out_path, month)
+        os.makedirs(part_dir, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(part, preserve_index=False), os.path.join(part_dir, f"{label}.parquet"))
+
+
+def join_transit_weather(transit_source, weather_path, out_path, months=None, tz=LOCAL_TZ):
+    weather = load_hourly_weather(weather_path, tz)
+    times = weather['datetime'].values
+    total = 0
+    first = True
+    for label, transit in iter_transit_chunks(transit_source, months):
+        if transit.empty:
+            continue
+        # only hand each chunk the slice of weather its days can touch
+        day = transit['day'] if transit['day'].dtype.kind == 'M' else parse_days(transit['day'], fmt=None)
+        lo = np.searchsorted(times, (day.min() - ASOF_TOLERANCE).to_datetime64(), side='left')
+        hi = np.searchsorted(times, (day.max() + pd.Timedelta(days=2)).to_datetime64(), side='right')
+        joined = join_chunk(transit, weather.iloc[lo:hi].reset_index(drop=True))
+
+        _write_output(joined, out_path, label, first)
+        first = False
+        total += len(joined)
+        print(f"🔗 {label}: {len(transit):,} transit rows -> {len(joined):,} joined")
+
+    print(f"✅ Merged data saved to '{out_path}' ({total:,} rows)")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Join transit intervals to the hourly weather that covers them.")
+    parser.add_argument("transit_source", help="cleaned CSV or month-partitioned directory")
+    parser.add_argument("weather_path", help="hourly weather CSV with a 'datetime' column, or an ingested weather directory")
+    parser.add_argument("--out", default="merged_transit_weather.csv", help="CSV file or partition directory")
+    parser.add_argument("--months", nargs="*", help="only join these YYYY-MM partitions")
+    parser.add_argument("--tz", default=LOCAL_TZ)
+    args = parser.parse_args()
+
+    join_transit_weather(args.transit_source, args.weather_path, args.out, months=args.months, tz=args.tz)
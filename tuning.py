@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from preprocessing import CLASS_TARGET, REG_TARGET
+
+# name -> (scale, low, high); 'int' / 'float' sample uniformly, 'log' log-uniformly
+XGB_SPACE = {
+    'max_depth': ('int', 3, 10),
+    'learning_rate': ('log', 0.02, 0.3),
+    'subsample': ('float', 0.5, 1.0),
+    'colsample_bytree': ('float', 0.5, 1.0),
+    'min_child_weight': ('log', 1.0, 20.0),
+    'reg_lambda': ('log', 0.1, 10.0),
+}
+RF_SPACE = {
+    'max_depth': ('int', 6, 30),
+    'max_features': ('float', 0.3, 1.0),
+    'min_samples_leaf': ('int', 1, 20),
+}
+VALIDATION_FRACTION = 0.2
+EARLY_STOPPING_ROUNDS = 20
+
+
+def sample_config(space, rng):
+    config = {}
+    for name, (scale, low, high) in space.items():
+        if scale == 'int':
+            config[name] = int(rng.integers(low, high + 1))
+        elif scale == 'log':
+            config[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            config[name] = float(rng.uniform(low, high))
+    return config
+
+
+def _fit_val_split(features, target):
+    # validation comes from the tail of the (already shuffled) training rows; the test rows stay untouched
+    X, _, y, _ = features.regression_split() if target == REG_TARGET else features.classification_split()
+    n_val = max(1, int(len(X) * VALIDATION_FRACTION))
+    n_fit = len(X) - n_val
+    return X[:n_fit], y[:n_fit], X[n_fit:], y[n_fit:]
+
+
+class XGBObjective:
+    space = XGB_SPACE
+
+    def __init__(self, features, target, fractions, max_rounds=1000, min_rounds=30, max_bin=256):
+        import xgboost as xgb
+
+        self.xgb = xgb
+        self.target = target
+        self.max_rounds = max_rounds
+        self.min_rounds = min_rounds
+        X_fit, y_fit, X_val, y_val = _fit_val_split(features, target)
+        # quantize once up front: subsets share the full matrix's bin cuts via ref=, and every
+        # trial at a given fraction reuses the same (train, val) pair
+        full = xgb.QuantileDMatrix(X_fit, y_fit, max_bin=max_bin)
+        self.subsets = {1.0: (full, xgb.QuantileDMatrix(X_val, y_val, ref=full))}
+        for fraction in sorted(set(fractions)):
+            if fraction < 1.0:
+                n = max(1, int(len(X_fit) * fraction))
+                train = xgb.QuantileDMatrix(X_fit[:n], y_fit[:n], ref=full)
+                self.subsets[fraction] = (train, xgb.QuantileDMatrix(X_val, y_val, ref=train))
+
+    def budget(self, resource, fraction):
+        return {'fraction': fraction, 'rounds': max(self.min_rounds, int(round(self.max_rounds * resource)))}
+
+    def __call__(self, config, budget, nthread):
+        params = dict(config, tree_method='hist', nthread=nthread, seed=42)
+        if self.target == REG_TARGET:
+            params.update(objective='reg:squarederror', eval_metric='mae')
+        else:
+            params.update(objective='binary:logistic', eval_metric='logloss')
+        train, val = self.subsets[budget['fraction']]
+        booster = self.xgb.train(params, train, num_boost_round=budget['rounds'],
+                                 evals=[(val, 'val')], early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                                 verbose_eval=False)
+        return float(booster.best_score), {'best_iteration': int(booster.best_iteration) + 1}
+
+
+class RFObjective:
+    space = RF_SPACE
+
+    def __init__(self, features, target, fractions, max_trees=300, min_trees=20):
+        self.target = target
+        self.max_trees = max_trees
+        self.min_trees = min_trees
+        self.X_fit, self.y_fit, self.X_val, self.y_val = _fit_val_split(features, target)
+
+    def budget(self, resource, fraction):
+        return {'fraction': fraction, 'trees': max(self.min_trees, int(round(self.max_trees * resource)))}
+
+    def __call__(self, config, budget, nthread):
+        from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+        from sklearn.metrics import log_loss, mean_absolute_error
+
+        n = max(1, int(len(self.X_fit) * budget['fraction']))
+        X, y = self.X_fit[:n], self.y_fit[:n]
+        if self.target == REG_TARGET:
+            model = RandomForestRegressor(n_estimators=budget['trees'], random_state=42, n_jobs=nthread, **config)
+            return float(mean_absolute_error(self.y_val, model.fit(X, y).predict(self.X_val))), {}
+        model = RandomForestClassifier(n_estimators=budget['trees'], random_state=42, n_jobs=nthread, **config)
+        proba = model.fit(X, y).predict_proba(self.X_val)
+        return float(log_loss(self.y_val, proba, labels=model.classes_)), {}
+
+
+def run_signature(features, space, seed, max_configs, eta, n_brackets, min_fraction):
+    # a logged trial is only reused by a run that would have drawn the same configs and budgets on the same data
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([space, seed, max_configs, eta, n_brackets, min_fraction, features.columns,
+                         features.n_train, features.values.shape]).encode())
+    values = features.values
+    for start in range(0, len(values), 100_000):
+        h.update(np.ascontiguousarray(values[start:start + 100_000]).tobytes())
+    return h.hexdigest()
+
+
+class TrialLog:
+    # append-only JSON lines; finished trials are skipped on resume
+    @staticmethod
+    def key(record):
+        return (record.get('run'), record['family'], record['target'], record['bracket'], record['config_id'],
+                record['rung'], json.dumps(record['budget'], sort_keys=True))
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.done[self.key(record)] = record
+
+    def get(self, run, family, target, bracket, config_id, rung, budget):
+        return self.done.get((run, family, target, bracket, config_id, rung, json.dumps(budget, sort_keys=True)))
+
+    def append(self, record):
+        with self.lock:
+            self.done[self.key(record)] = record
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+
+
+class BudgetTracker:
+    def __init__(self, wall_seconds=None, core_hours=None):
+        self.deadline = time.perf_counter() + wall_seconds if wall_seconds else None
+        self.core_seconds = core_hours * 3600 if core_hours else None
+        self.used = 0.0
+        self.lock = threading.Lock()
+
+    def charge(self, seconds, cores):
+        with self.lock:
+            self.used += seconds * cores
+
+    def exhausted(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return True
+        return self.core_seconds is not None and self.used >= self.core_seconds
+
+
+def hyperband_brackets(max_configs, eta, n_brackets):
+    # each bracket: a list of (n_configs, resource) rungs; resource 1.0 = full data and full rounds
+    brackets = []
+    s_max = n_brackets - 1
+    for s in range(s_max, -1, -1):
+        n = max(1, int(math.ceil(max_configs * eta ** (s - s_max))))
+        # floor(log_eta(n)) + 1 in integers: math.log(243, 3) is 4.999..., which drops the last rung
+        rungs_count, left = 1, n
+        while left >= eta:
+            left //= eta
+            rungs_count += 1
+        rungs = []
+        for i in range(rungs_count):
+            rungs.append((max(1, n // eta ** i), float(eta ** (i - rungs_count + 1))))
+        brackets.append(rungs)
+    return brackets
+
+
+def tune(features, family='xgb', target=REG_TARGET, max_configs=27, eta=3, n_brackets=1, min_fraction=0.05,
+         parallel_trials=2, threads_per_trial=1, wall_seconds=None, core_hours=None, log_path=None, seed=42):
+    brackets = hyperband_brackets(max_configs, eta, n_brackets)
+
+    def fraction_of(resource):
+        return min(1.0, max(min_fraction, resource))
+
+    fractions = {fraction_of(r) for rungs in brackets for _, r in rungs}
+    objective = (XGBObjective if family == 'xgb' else RFObjective)(features, target, fractions)
+
+    run = run_signature(features, objective.space, seed, max_configs, eta, n_brackets, min_fraction)
+    log = TrialLog(log_path)
+    budget = BudgetTracker(wall_seconds, core_hours)
+    rng = np.random.default_rng(seed)
+    best = None
+
+    def run_trial(bracket, config_id, rung, config, trial_budget):
+        cached = log.get(run, family, target, bracket, config_id, rung, trial_budget)
+        if cached is not None and cached['params'] == config:
+            return cached
+        start = time.perf_counter()
+        score, extra = objective(config, trial_budget, threads_per_trial)
+        wall = time.perf_counter() - start
+        budget.charge(wall, threads_per_trial)
+        record = {'run': run, 'bracket': bracket, 'config_id': config_id, 'rung': rung, 'family': family, 'target': target,
+                  'params': config, 'budget': trial_budget, 'score': score, 'wall_s': round(wall, 3), **extra}
+        log.append(record)
+        return record
+
+    with ThreadPoolExecutor(max_workers=parallel_trials) as pool:
+        for b, rungs in enumerate(brackets):
+            # configs are drawn deterministically from the seed, so a resumed run regenerates the same ids
+            configs = {i: sample_config(objective.space, rng) for i in range(rungs[0][0])}
+            survivors = list(configs)
+            for rung, (n_keep, resource) in enumerate(rungs):
+                survivors = survivors[:n_keep]
+                trial_budget = objective.budget(resource, fraction_of(resource))
+                futures = []
+                for cid in survivors:
+                    if budget.exhausted() and log.get(run, family, target, b, cid, rung, trial_budget) is None:
+                        break
+                    futures.append(pool.submit(run_trial, b, cid, rung, configs[cid], trial_budget))
+                results = [f.result() for f in futures]
+                if not results:
+                    break
+                results.sort(key=lambda r: r['score'])
+                print(f"🎯 bracket {b} rung {rung}: {len(results)} trials at {trial_budget}, best {results[0]['score']:.4f}")
+                top = results[0]
+                if rung == len(rungs) - 1 or len(results) == 1:
+                    if best is None or top['score'] < best['score']:
+                        best = top
+                survivors = [r['config_id'] for r in results[:max(1, len(results) // eta)]]
+                if budget.exhausted():
+                    print("⏱️ Budget exhausted; stopping early.")
+                    return best or top
+    return best
+
+
+if __name__ == "__main__":
+    from data_processor import TransitDataProcessor
+
+    parser = argparse.ArgumentParser(description="Successive-halving / Hyperband tuning for the XGBoost and RF trainers.")
+    parser.add_argument("csv_path", nargs="?", default="cleaned_transit_data.csv")
+    parser.add_argument("--family", choices=['xgb', 'rf'], default='xgb')
+    parser.add_argument("--target", choices=[REG_TARGET, CLASS_TARGET], default=REG_TARGET)
+    parser.add_argument("--max-configs", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--brackets", type=int, default=1, help="1 = plain successive halving, >1 = Hyperband")
+    parser.add_argument("--parallel-trials", type=int, default=2)
+    parser.add_argument("--threads-per-trial", type=int, default=1)
+    parser.add_argument("--time-budget", type=float, help="wall-clock seconds")
+    parser.add_argument("--core-hours", type=float)
+    parser.add_argument("--log", default="tuning_trials.jsonl")
+    args = parser.parse_args()
+
+    processor = TransitDataProcessor(args.csv_path)
+    processor.load_data()
+    processor.create_on_time_status()
+    processor.preprocess_all()
+
+    best = tune(processor.features, args.family, args.target, args.max_configs, args.eta, args.brackets,
+                parallel_trials=args.parallel_trials, threads_per_trial=args.threads_per_trial,
+                wall_seconds=args.time_budget, core_hours=args.core_hours, log_path=args.log)
+    if best:
+        print(f"\n🏆 Best score {best['score']:.4f} with {best['params']} at {best['budget']}")
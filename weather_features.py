@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from data_cache import CACHE_DIR, read_cached_table, source_digest
+from instrumentation import trace_stage
+from transit_weather_join import ASOF_TOLERANCE, LOCAL_TZ, load_hourly_weather
+
+# bump whenever a feature definition below changes
+WEATHER_FEATURE_VERSION = 1
+
+# same bins dataEDA_weather.py has always used (pd.cut, right-inclusive)
+WINDGUST_BINS = [-1, 20, 40, 60, 200]
+WINDGUST_LEVELS = ['Low', 'Medium', 'High', 'Extreme']
+SNOW_BINS = [-0.1, 0.1, 2, 100]
+SNOW_LEVELS = ['None', 'Snow', 'Heavy']
+# the README's finding: delays climb once gusts pass 25 km/h
+GUST_THRESHOLD = 25
+FREEZING_C = 0.0
+
+
+def bin_codes(values, bins):
+    # pd.cut(values, bins).codes without building intervals: (b[i], b[i+1]] -> i, outside or NaN -> -1
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.searchsorted(np.asarray(bins, dtype=np.float64), values, side='left') - 1
+    return np.where(np.isnan(values) | (codes < 0) | (codes >= len(bins) - 1), -1, codes)
+
+
+def bin_levels(values, bins, labels):
+    return pd.Categorical.from_codes(bin_codes(values, bins), categories=labels)
+
+
+def build_weather_features(weather):
+    # every window ends at (and includes) the hour it is stamped with, so a transit interval looked up at its
+    # start hour only ever sees weather up to that hour
+    hourly = weather.set_index('datetime').sort_index()
+    hourly = hourly[~hourly.index.duplicated(keep='last')].asfreq('h')
+    snow = hourly['snow'].fillna(0)
+    gust = hourly['windgust']
+    temp = hourly['temp']
+    below = (temp <= FREEZING_C).astype('float32').where(temp.notna())
+
+    out = pd.DataFrame(index=hourly.index)
+    out['snow_6h'] = snow.rolling('6h').sum()
+    out['snow_24h'] = snow.rolling('24h').sum()
+    out['snow_72h'] = snow.rolling('72h').sum()
+    out['precip_24h'] = hourly['precip'].fillna(0).rolling('24h').sum()
+    out['windgust_lag_1h'] = gust.shift(1)
+    out['windgust_max_3h'] = gust.rolling('3h').max()
+    out['windgust_max_24h'] = gust.rolling('24h').max()
+    out['windgust_max_prev_24h'] = out['windgust_max_24h'].shift(24)
+    out['gust_over_threshold'] = (out['windgust_max_3h'] > GUST_THRESHOLD).astype('float32')
+    out['below_freezing'] = below
+    out['hours_below_freezing_24h'] = below.rolling('24h').sum()
+    # both sides of zero within a day: melt then refreeze (or the reverse) -- ice on the roads
+    temp_min, temp_max = temp.rolling('24h').min(), temp.rolling('24h').max()
+    out['freeze_thaw_24h'] = ((temp_min < FREEZING_C) & (temp_max > FREEZING_C)).astype('float32')
+    out['windgust_level'] = bin_codes(gust, WINDGUST_BINS)
+    out['snow_level'] = bin_codes(snow, SNOW_BINS)
+    return out.astype('float32').reset_index()
+
+
+class WeatherFeatureStore:
+    # hourly feature table; rows are looked up by timestamp with one searchsorted per batch
+    def __init__(self, table):
+        self.table = table
+        self.times = table['datetime'].to_numpy(dtype='datetime64[ns]')
+        self.columns = [c for c in table.columns if c != 'datetime']
+
+    @classmethod
+    def from_weather(cls, weather):
+        return cls(build_weather_features(weather))
+
+    @classmethod
+    def read(cls, path):
+        return cls(read_cached_table(path).to_pandas())
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        feather.write_feather(pa.Table.from_pandas(self.table, preserve_index=False), tmp, compression='uncompressed')
+        os.replace(tmp, path)
+
+    def lookup(self, timestamps):
+        ts = pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype='datetime64[ns]')
+        pos = np.searchsorted(self.times, ts, side='right') - 1
+        # the hour a timestamp falls in; nothing within the join's as-of tolerance -> NaN
+        valid = (pos >= 0) & ~np.isnat(ts)
+        valid[valid] &= (ts[valid] - self.times[pos[valid]]) <= ASOF_TOLERANCE.to_timedelta64()
+        out = {}
+        for col in self.columns:
+            values = self.table[col].to_numpy()
+            out[col] = np.where(valid, values[np.maximum(pos, 0)], np.nan).astype(np.float32)
+        return pd.DataFrame(out, index=getattr(timestamps, 'index', None))
+
+    def attach(self, df):
+        # rows carry either an explicit 'datetime' or the day + time_period their interval starts at
+        if 'datetime' in df.columns:
+            times = df['datetime']
+        elif 'day' in df.columns and 'time_period' in df.columns:
+            from transit_schema import interval_start
+            times = interval_start(df)
+        else:
+            return df
+        with trace_stage('weather_features.lookup', df):
+            features = self.lookup(times)
+        features.index = df.index
+        return df.drop(columns=[c for c in self.columns if c in df.columns]).join(features)
+
+
+def _weather_digest(weather_path, cache_dir):
+    if not os.path.isdir(weather_path):
+        return source_digest(weather_path, cache_dir)
+    # ingested month partitions: one digest over every part file's digest
+    from streaming_cleaner import list_partition_files
+    h = hashlib.blake2b(digest_size=16)
+    for path in list_partition_files(weather_path):
+        h.update(source_digest(path, cache_dir).encode())
+    return h.hexdigest()
+
+
+def weather_store_path(weather_path, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(os.path.normpath(weather_path)))[0]
+    digest = _weather_digest(weather_path, cache_dir)
+    return os.path.join(cache_dir, f"wxfeatures_{stem}-{digest}-w{WEATHER_FEATURE_VERSION}.feather")
+
+
+def load_weather_store(weather_path, cache_dir=CACHE_DIR, tz=LOCAL_TZ):
+    # computed once per hourly series; later runs memory-map the cached table
+    if cache_dir is None:
+        return WeatherFeatureStore.from_weather(load_hourly_weather(weather_path, tz))
+    os.makedirs(cache_dir, exist_ok=True)
+    path = weather_store_path(weather_path, cache_dir)
+    if os.path.exists(path):
+        with trace_stage('weather_features.cache_read'):
+            return WeatherFeatureStore.read(path)
+    with trace_stage('weather_features.build'):
+        store = WeatherFeatureStore.from_weather(load_hourly_weather(weather_path, tz))
+    store.save(path)
+    # wxfeatures_{stem}-{digest}-w{N}.feather: compare the whole stem, so 'weather' never sweeps 'weather-2024'
+    stem = os.path.basename(path).rsplit('-', 2)[0]
+    for name in os.listdir(cache_dir):
+        if name.endswith('.feather') and name.rsplit('-', 2)[0] == stem and os.path.join(cache_dir, name) != path:
+            os.remove(os.path.join(cache_dir, name))
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build (or reuse) the cached hourly weather feature store.")
+    parser.add_argument("weather_path", help="hourly weather CSV or ingested weather directory")
+    parser.add_argument("--tz", default=LOCAL_TZ)
+    parser.add_argument("--lookup", nargs="*", help="timestamps to look up, e.g. 2025-01-15T16:00")
+    args = parser.parse_args()
+
+    store = load_weather_store(args.weather_path, tz=args.tz)
+    table = store.table
+    print(f"✅ {len(table):,} hourly rows x {len(store.columns)} features "
+          f"({table['datetime'].min()} .. {table['datetime'].max()})")
+    if args.lookup:
+        times = pd.Series(pd.to_datetime(args.lookup, format='ISO8601'))
+        print(store.lookup(times).assign(datetime=args.lookup).set_index('datetime').T.round(2).to_string())
+    else:
+        print(table.describe().T.round(2).to_string())